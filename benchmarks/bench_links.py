@@ -0,0 +1,116 @@
+"""Micro-benchmark: baseline HasLink logic vs handlers.links.LinkDetector.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_links
+"""
+import os
+import random
+import re
+import sys
+import timeit
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("BOT_TOKEN", "0:benchmark")
+
+from aiogram.enums import MessageEntityType  # noqa: E402
+from aiogram.types import Chat, Message, MessageEntity  # noqa: E402
+
+from handlers.links import DomainMatcher, LinkDetector  # noqa: E402
+
+WORDS = (
+    "salom assalomu alaykum qalaysiz rahmat yaxshi bugun ertaga guruh kanal xabar "
+    "narxi qancha sotiladi olaman manzil telefon ishlaydi yangilik 👍 🔥 ✅ zo'r"
+).split()
+URLS = ["https://example.com/post/1", "http://spam-shop.uz/sale", "www.kino-uz.net", "t.me/joinchat/AbCdEf"]
+MENTIONS = ["@uzguruh_bot", "@reklama_kanal", "@someuser123", "@sotuvchi_uz"]
+BLOCKED = ["spam-shop.uz", "kino-uz.net", "casino.uz", "bet777.com", "free-money.org"]
+
+_TOKEN_RE = re.compile(r"https?://\S+|www\.\S+|t\.me/\S+|@\w{5,}")
+
+
+def _utf16_len(text: str) -> int:
+    return len(text.encode("utf-16-le")) // 2
+
+
+def _entities(text: str):
+    entities = []
+    for match in _TOKEN_RE.finditer(text):
+        token = match.group(0)
+        kind = MessageEntityType.MENTION if token.startswith("@") else MessageEntityType.URL
+        entities.append(MessageEntity(
+            type=kind, offset=_utf16_len(text[:match.start()]), length=_utf16_len(token)
+        ))
+    return entities or None
+
+
+def make_corpus(size: int = 5000, seed: int = 7):
+    rnd = random.Random(seed)
+    chat = Chat(id=-100123, type="supergroup")
+    corpus = []
+    for i in range(size):
+        words = [rnd.choice(WORDS) for _ in range(rnd.randint(3, 40))]
+        roll = rnd.random()
+        if roll < 0.08:
+            words.insert(rnd.randrange(len(words)), rnd.choice(URLS))
+        elif roll < 0.14:
+            words.insert(rnd.randrange(len(words)), rnd.choice(MENTIONS))
+        elif roll < 0.16:
+            words.insert(rnd.randrange(len(words)), "spam-shop . uz casino.uz")
+        text = " ".join(words)
+        if rnd.random() < 0.15:
+            corpus.append(Message(message_id=i, date=datetime.now(), chat=chat,
+                                  caption=text, caption_entities=_entities(text)))
+        else:
+            corpus.append(Message(message_id=i, date=datetime.now(), chat=chat,
+                                  text=text, entities=_entities(text)))
+    return corpus
+
+
+def baseline_has_link(message: Message) -> bool:
+    """HasLink.__call__ before the detector (caption slicing made safe).
+
+    Mention offsets are UTF-16 based, so slicing the str after an emoji
+    misreads @uzguruh_bot as a foreign mention; those messages show up
+    as diff_vs_baseline for the detector.
+    """
+    entities = message.entities or []
+    caption_entities = message.caption_entities or []
+    for entity in entities + caption_entities:
+        if entity.type in {MessageEntityType.URL, MessageEntityType.TEXT_LINK, MessageEntityType.MENTION}:
+            if entity.type == MessageEntityType.MENTION:
+                source = message.text or message.caption
+                mentioned_text = source[entity.offset: entity.offset + entity.length]
+                if mentioned_text.lower() == "@uzguruh_bot":
+                    continue
+            return True
+    for text in [message.text, message.caption]:
+        if text:
+            for mention in re.findall(r'@[\w\d_]{5,}', text):
+                if mention.lower() != "@uzguruh_bot":
+                    return True
+    return False
+
+
+def main() -> None:
+    corpus = make_corpus()
+    detector = LinkDetector("uzguruh_bot")
+    blocklist = DomainMatcher(BLOCKED)
+
+    cases = {
+        "baseline": lambda: [baseline_has_link(m) for m in corpus],
+        "detector": lambda: [detector.has_link(m) for m in corpus],
+        "detector+blocklist": lambda: [detector.has_link(m, blocklist) for m in corpus],
+    }
+    base = cases["baseline"]()
+    print(f"corpus: {len(corpus)} messages, {sum(base)} flagged by baseline")
+    for name, run in cases.items():
+        result = run()
+        best = min(timeit.repeat(run, number=5, repeat=5)) / 5
+        mismatches = sum(a != b for a, b in zip(base, result))
+        print(f"{name:20s} {best / len(corpus) * 1e6:7.2f} us/msg  flagged={sum(result):5d}  diff_vs_baseline={mismatches}")
+
+
+if __name__ == "__main__":
+    main()
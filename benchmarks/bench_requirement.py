@@ -0,0 +1,179 @@
+"""Latency of the per-message requirement check and the join path.
+
+Compares the query sequences of the original bot (COUNT(*) over
+add_members, one statement per round-trip) with requirement_left() and
+the single-statement add_members(). Needs the
+PostgreSQL database from .env (DB_USER, DB_PASS, DATABASE, ...); the
+data is written under a synthetic group id and removed afterwards.
+
+    python -m benchmarks.bench_requirement --users 20000 --calls 5000 --concurrency 20
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+from typing import Awaitable, Callable, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("BOT_TOKEN", "0:benchmark")
+
+from database.frombase import add_members, init_db  # noqa: E402
+from database.policy import group_policies  # noqa: E402
+from database.pool import close_pool, execute, fetchrow, fetchval, transaction  # noqa: E402
+
+GROUP_ID = -1009990000001
+REQUIRED = 5
+
+
+async def legacy_check(group_id: int, user_id: int, required_count: int) -> int:
+    """Original check_user_requirement: requirement row, status, COUNT(*) over add_members, status update"""
+    required_row = await fetchrow("""
+        SELECT required_count FROM group_requirement
+        WHERE group_id = $1
+    """, group_id)
+    if not required_row:
+        return 0
+    required_count = required_row[0]
+    status_row = await fetchrow("""
+        SELECT status FROM user_requirement
+        WHERE group_id = $1 AND user_id = $2
+    """, group_id, user_id)
+    if status_row and status_row[0]:
+        return 0
+    added_count = await fetchval("""
+        SELECT COUNT(*) FROM add_members
+        WHERE group_id = $1 AND user_id = $2
+    """, group_id, user_id)
+    if added_count >= required_count:
+        await execute("""
+            INSERT INTO user_requirement (group_id, user_id, status)
+            VALUES ($1, $2, TRUE)
+            ON CONFLICT(group_id, user_id)
+            DO UPDATE SET status = TRUE
+        """, group_id, user_id)
+        return 0
+    return required_count - added_count
+
+
+async def function_check(group_id: int, user_id: int, required_count: int) -> int:
+    return await fetchval("SELECT requirement_left($1, $2, $3)", group_id, user_id, required_count)
+
+
+async def legacy_add(group_id: int, user_id: int, member_ids: List[int]) -> None:
+    """Original add_member, called once per new member: exists check, insert, COUNT(*), requirement, status"""
+    for member_id in member_ids:
+        async with transaction() as conn:
+            exists = await conn.fetchrow("""
+                SELECT 1 FROM add_members
+                WHERE group_id = $1 AND user_id = $2 AND member = $3
+            """, group_id, user_id, member_id)
+            if exists:
+                continue
+            await conn.execute("""
+                INSERT INTO add_members (group_id, user_id, member)
+                VALUES ($1, $2, $3)
+            """, group_id, user_id, member_id)
+            added_count = await conn.fetchval("""
+                SELECT COUNT(*) FROM add_members
+                WHERE group_id = $1 AND user_id = $2
+            """, group_id, user_id)
+            required_row = await conn.fetchrow("""
+                SELECT required_count FROM group_requirement
+                WHERE group_id = $1
+            """, group_id)
+            required_count = required_row[0] if required_row else 0
+            if added_count >= required_count:
+                await conn.execute("""
+                    INSERT INTO user_requirement (group_id, user_id, status)
+                    VALUES ($1, $2, TRUE)
+                    ON CONFLICT (group_id, user_id)
+                    DO UPDATE SET status = EXCLUDED.status
+                """, group_id, user_id)
+
+
+async def cleanup() -> None:
+    for table in ("add_members", "add_counts", "user_requirement", "group_requirement"):
+        await execute(f"DELETE FROM {table} WHERE group_id = $1", GROUP_ID)
+
+
+async def seed(users: int) -> List[int]:
+    """Adders with 0..10 added members; about a third already have a status row"""
+    await cleanup()
+    rnd = random.Random(1)
+    user_ids = list(range(1, users + 1))
+    counts = [rnd.randint(0, 10) for _ in user_ids]
+    await execute("""
+        INSERT INTO group_requirement (group_id, required_count) VALUES ($1, $2)
+    """, GROUP_ID, REQUIRED)
+    # Ikkala jadval bir xil holatda: eski yo'l add_members'ni sanaydi, yangisi add_counts'ni o'qiydi
+    adders = [u for u, c in zip(user_ids, counts) for _ in range(c)]
+    await execute("""
+        INSERT INTO add_members (group_id, user_id, member)
+        SELECT $1, user_id, -row_number() OVER () FROM unnest($2::bigint[]) AS user_id
+    """, GROUP_ID, adders)
+    await execute("""
+        INSERT INTO add_counts (group_id, user_id, added_count)
+        SELECT $1, * FROM unnest($2::bigint[], $3::int[])
+    """, GROUP_ID, user_ids, counts)
+    with_status = [(u, c >= REQUIRED) for u, c in zip(user_ids, counts) if rnd.random() < 0.33]
+    await execute("""
+        INSERT INTO user_requirement (group_id, user_id, status)
+        SELECT $1, * FROM unnest($2::bigint[], $3::boolean[])
+    """, GROUP_ID, [u for u, _ in with_status], [s for _, s in with_status])
+    return user_ids
+
+
+async def measure(call: Callable[[], Awaitable[None]], calls: int, concurrency: int) -> List[float]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+
+    async def one() -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            await call()
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    await asyncio.gather(*(one() for _ in range(calls)))
+    return latencies
+
+
+def report(name: str, latencies: List[float]) -> None:
+    q = statistics.quantiles(latencies, n=100)
+    print(f"{name:28s} p50 {q[49]:7.3f} ms   p99 {q[98]:7.3f} ms   mean {statistics.fmean(latencies):7.3f} ms")
+
+
+async def main(args) -> None:
+    await init_db()
+    group_policies.set_required_count(GROUP_ID, REQUIRED)
+    try:
+        rnd = random.Random(2)
+        # Taxminan 10% - hali qo'shmagan (add_counts'da yo'q) foydalanuvchilar
+        pick = lambda: rnd.randint(1, int(args.users * 1.1))  # noqa: E731
+
+        for name, check in (("check: original (COUNT)", legacy_check), ("check: requirement_left()", function_check)):
+            await seed(args.users)
+            rnd.seed(2)  # ikkala variant bir xil foydalanuvchilar ketma-ketligida
+            report(name, await measure(lambda: check(GROUP_ID, pick(), REQUIRED), args.calls, args.concurrency))
+
+        next_member = iter(range(10 ** 12, 10 ** 13))
+        for name, add in (("add x3: original per member", legacy_add), ("add x3: add_members()", add_members)):
+            await seed(args.users)
+            rnd.seed(3)
+            report(name, await measure(
+                lambda: add(GROUP_ID, pick(), [next(next_member) for _ in range(3)]),
+                args.calls // 5, args.concurrency
+            ))
+    finally:
+        await cleanup()
+        await close_pool()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--calls", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    asyncio.run(main(parser.parse_args()))
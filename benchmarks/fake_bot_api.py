@@ -0,0 +1,190 @@
+"""Stand-in Telegram Bot API and update generator for local runs.
+
+Serve a fake Bot API and point the bot at it with BOT_API_URL:
+
+    python -m benchmarks.fake_bot_api serve --port 8081 --latency 30
+    BOT_API_URL=http://127.0.0.1:8081 BOT_MODE=webhook WEBHOOK_URL=http://127.0.0.1:8080 \\
+        WEBHOOK_WORKERS=4 python main.py
+
+Then push synthetic group traffic to the webhook:
+
+    python -m benchmarks.fake_bot_api push --url http://127.0.0.1:8080/webhook --updates 5000 --chats 50
+
+``serve --backlog N`` queues N updates to be returned by getUpdates
+(for polling mode). Every method call is counted and printed on exit.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import Counter
+from typing import Any, Dict, List
+
+from aiohttp import ClientSession, web
+
+BOT_USER = {"id": 0, "is_bot": True, "first_name": "Bot", "username": "uzguruh_bot"}
+OWNER_ID = 42
+ADMIN_RIGHTS = dict.fromkeys((
+    "can_manage_chat", "can_delete_messages", "can_manage_video_chats", "can_restrict_members",
+    "can_promote_members", "can_change_info", "can_invite_users", "can_post_stories",
+    "can_edit_stories", "can_delete_stories", "can_pin_messages"
+), True)
+
+
+def _user(user_id: int) -> Dict[str, Any]:
+    return {"id": user_id, "is_bot": False, "first_name": f"User {user_id}"}
+
+
+def make_updates(count: int, chats: int, users: int = 500, seed: int = 1, first_id: int = 1) -> List[Dict[str, Any]]:
+    """Group traffic: plain messages, links, joins and leaves"""
+    rnd = random.Random(seed)
+    updates = []
+    for n in range(count):
+        chat = {"id": -1000000000000 - rnd.randrange(chats), "type": "supergroup", "title": "Guruh"}
+        sender = _user(1000 + rnd.randrange(users))
+        message: Dict[str, Any] = {"message_id": n + 1, "date": int(time.time()), "chat": chat, "from": sender}
+        roll = rnd.random()
+        if roll < 0.05:
+            message["new_chat_members"] = [_user(100000 + rnd.randrange(10 ** 6)) for _ in range(rnd.randint(1, 3))]
+        elif roll < 0.07:
+            message["left_chat_member"] = sender
+        elif roll < 0.12:
+            message["text"] = "arzon narxda https://spam-shop.uz/sale"
+            message["entities"] = [{"type": "url", "offset": 12, "length": 26}]
+        else:
+            message["text"] = rnd.choice(("salom", "rahmat", "qalaysiz?", "bugun uchrashamizmi", "zo'r 👍"))
+        updates.append({"update_id": first_id + n, "message": message})
+    return updates
+
+
+class FakeBotAPI:
+    def __init__(self, latency: float = 0.0, retry_after: float = 0.0, backlog: int = 0, chats: int = 50):
+        self.latency = latency
+        self.retry_after = retry_after
+        self.calls: Counter = Counter()
+        self.backlog = make_updates(backlog, chats) if backlog else []
+        self._message_id = 0
+
+    def _result(self, bot_id: int, method: str, params: Dict[str, Any]) -> Any:
+        chat_id = int(params.get("chat_id", 0) or 0)
+        if method == "getme":
+            return {**BOT_USER, "id": bot_id}
+        if method == "getupdates":
+            offset = int(params.get("offset", 0) or 0)
+            limit = int(params.get("limit", 100) or 100)
+            self.backlog = [u for u in self.backlog if u["update_id"] >= offset]
+            return self.backlog[:limit]
+        if method == "getchatmember":
+            user_id = int(params["user_id"])
+            if user_id == bot_id:
+                return {"status": "administrator", "user": {**BOT_USER, "id": bot_id}, "can_be_edited": False,
+                        "is_anonymous": False, **ADMIN_RIGHTS}
+            if user_id == OWNER_ID:
+                return {"status": "creator", "user": _user(user_id), "is_anonymous": False}
+            return {"status": "member", "user": _user(user_id)}
+        if method == "getchatadministrators":
+            return [{"status": "creator", "user": _user(OWNER_ID), "is_anonymous": False}]
+        if method == "getchatmembercount":
+            return 100
+        if method == "getchat":
+            return {"id": chat_id, "type": "channel" if chat_id < 0 else "private", "title": f"Chat {chat_id}",
+                    "accent_color_id": 0, "max_reaction_count": 11,
+                    "accepted_gift_types": dict.fromkeys(
+                        ("unlimited_gifts", "limited_gifts", "unique_gifts", "premium_subscription"), False)}
+        if method in ("sendmessage", "copymessage", "forwardmessage"):
+            self._message_id += 1
+            if method == "copymessage":
+                return {"message_id": self._message_id}
+            return {"message_id": self._message_id, "date": int(time.time()),
+                    "chat": {"id": chat_id, "type": "private" if chat_id > 0 else "supergroup"},
+                    "text": params.get("text", "")}
+        return True
+
+    async def handle(self, request: web.Request) -> web.Response:
+        token, method = request.match_info["token"], request.match_info["method"]
+        method = method.lower()
+        self.calls[method] += 1
+        if request.content_type == "application/json":
+            params = await request.json()
+        else:
+            params = dict(await request.post())
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.retry_after and method != "getupdates" and random.random() < self.retry_after:
+            self.calls["429"] += 1
+            return web.json_response({"ok": False, "error_code": 429, "description": "Too Many Requests: retry after 1",
+                                      "parameters": {"retry_after": 1}}, status=429)
+        bot_id = int(token.split(":", 1)[0] or 0)
+        return web.json_response({"ok": True, "result": self._result(bot_id, method, params)})
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self.handle)
+        return app
+
+
+async def serve(args) -> None:
+    api = FakeBotAPI(args.latency / 1000, args.retry_after, args.backlog, args.chats)
+    runner = web.AppRunner(api.app())
+    await runner.setup()
+    await web.TCPSite(runner, args.host, args.port).start()
+    print(f"Fake Bot API on http://{args.host}:{args.port}")
+    try:
+        while True:
+            await asyncio.sleep(10)
+            print(json.dumps(dict(api.calls), sort_keys=True))
+    finally:
+        await runner.cleanup()
+
+
+async def push(args) -> None:
+    updates = make_updates(args.updates, args.chats, first_id=args.first_id)
+    headers = {"X-Telegram-Bot-Api-Secret-Token": args.secret} if args.secret else {}
+    statuses: Counter = Counter()
+    queue: asyncio.Queue = asyncio.Queue()
+    for update in updates:
+        queue.put_nowait(update)
+
+    async with ClientSession() as session:
+        async def sender() -> None:
+            while not queue.empty():
+                update = queue.get_nowait()
+                async with session.post(args.url, json=update, headers=headers) as response:
+                    statuses[response.status] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(sender() for _ in range(args.connections)))
+        elapsed = time.perf_counter() - started
+    print(f"{len(updates)} updates in {elapsed:.2f}s ({len(updates) / elapsed:.0f}/s), statuses: {dict(statuses)}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser("serve")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8081)
+    serve_parser.add_argument("--latency", type=float, default=0, help="ms per call")
+    serve_parser.add_argument("--retry-after", type=float, default=0, help="share of calls answered with 429")
+    serve_parser.add_argument("--backlog", type=int, default=0, help="updates waiting in getUpdates")
+    serve_parser.add_argument("--chats", type=int, default=50)
+
+    push_parser = commands.add_parser("push")
+    push_parser.add_argument("--url", default="http://127.0.0.1:8080/webhook")
+    push_parser.add_argument("--secret", default="")
+    push_parser.add_argument("--updates", type=int, default=1000)
+    push_parser.add_argument("--chats", type=int, default=50)
+    push_parser.add_argument("--connections", type=int, default=40)
+    push_parser.add_argument("--first-id", type=int, default=1)
+
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args) if args.command == "serve" else push(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
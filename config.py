@@ -1,6 +1,7 @@
 import os
-import psycopg2
 from aiogram import Bot, Dispatcher
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -8,11 +9,97 @@ BOT_TOKEN = os.getenv("BOT_TOKEN")
 USERNAME = os.getenv("DB_USER")
 PASSWORD = os.getenv("DB_PASS")
 DATABASE = os.getenv("DATABASE")
+DB_HOST = os.getenv("DB_HOST", "localhost")
+DB_PORT = int(os.getenv("DB_PORT", "5432"))
 
-conn = psycopg2.connect(database=DATABASE, user=USERNAME, password=PASSWORD, host="localhost", port=5432)
-cur = conn.cursor()
+# asyncpg pool sozlamalari
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "2"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+DB_HEALTH_INTERVAL = int(os.getenv("DB_HEALTH_INTERVAL", "30"))
+
+# Izoh statistikasini yozish buferi
+COMMENT_FLUSH_INTERVAL = float(os.getenv("COMMENT_FLUSH_INTERVAL", "5"))
+COMMENT_FLUSH_SIZE = int(os.getenv("COMMENT_FLUSH_SIZE", "500"))
+
+# Guruh census (a'zolar soni, bot adminligi) yangilanish oralig'i, soniya
+CENSUS_REFRESH_INTERVAL = float(os.getenv("CENSUS_REFRESH_INTERVAL", "600"))
+CENSUS_FLUSH_INTERVAL = float(os.getenv("CENSUS_FLUSH_INTERVAL", "10"))
+
+# Kanal obunasini tekshirish: bir vaqtdagi so'rovlar soni va har bir so'rov uchun timeout
+SUBSCRIPTION_CHECK_CONCURRENCY = int(os.getenv("SUBSCRIPTION_CHECK_CONCURRENCY", "25"))
+SUBSCRIPTION_CHECK_TIMEOUT = float(os.getenv("SUBSCRIPTION_CHECK_TIMEOUT", "5"))
+
+# Kanal a'zoligi natijalari cache'i: obuna bo'lganlar kam, bo'lmaganlar tez qayta tekshiriladi
+MEMBERSHIP_CACHE_SIZE = int(os.getenv("MEMBERSHIP_CACHE_SIZE", "100000"))
+MEMBERSHIP_POSITIVE_TTL = float(os.getenv("MEMBERSHIP_POSITIVE_TTL", "600"))
+MEMBERSHIP_NEGATIVE_TTL = float(os.getenv("MEMBERSHIP_NEGATIVE_TTL", "15"))
+
+# Kanal nomlari fonda yangilanish oralig'i, soniya
+CHANNEL_INFO_REFRESH_INTERVAL = float(os.getenv("CHANNEL_INFO_REFRESH_INTERVAL", "21600"))
+
+# Ommaviy xabar yuborish: parallel so'rovlar, chunk hajmi (tezlik OUTGOING_RATE bilan cheklanadi)
+BROADCAST_CONCURRENCY = int(os.getenv("BROADCAST_CONCURRENCY", "20"))
+BROADCAST_CHUNK_SIZE = int(os.getenv("BROADCAST_CHUNK_SIZE", "500"))
+
+# Guruhlarni yangilash: parallel so'rovlar soni va fonda ishga tushish oralig'i (0 - o'chirilgan)
+GROUP_REFRESH_CONCURRENCY = int(os.getenv("GROUP_REFRESH_CONCURRENCY", "10"))
+GROUP_REFRESH_INTERVAL = float(os.getenv("GROUP_REFRESH_INTERVAL", "21600"))
+
+# Admin panel statistikasi cache muddati, soniya
+STATS_TTL = float(os.getenv("STATS_TTL", "60"))
+
+# Foydalanuvchi ismlari cache'i va bazaga yozish oralig'i
+PROFILE_CACHE_SIZE = int(os.getenv("PROFILE_CACHE_SIZE", "200000"))
+PROFILE_FLUSH_INTERVAL = float(os.getenv("PROFILE_FLUSH_INTERVAL", "30"))
+
+# /top va /izohlar tayyor matnlari cache muddati, soniya
+LEADERBOARD_TTL = float(os.getenv("LEADERBOARD_TTL", "30"))
+
+# Havolalarni aniqlash: botning o'zi va ruxsat etilgan domen/username'lar (vergul bilan)
+BOT_USERNAME = os.getenv("BOT_USERNAME", "uzguruh_bot")
+LINK_ALLOWED_DOMAINS = [d.strip() for d in os.getenv("LINK_ALLOWED_DOMAINS", "").split(",") if d.strip()]
+LINK_ALLOWED_USERNAMES = [u.strip() for u in os.getenv("LINK_ALLOWED_USERNAMES", "").split(",") if u.strip()]
+
+# Update'larni qabul qilish: "polling" yoki "webhook"
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+# Bot API manzili (local Bot API server yoki test uchun soxta server), bo'sh bo'lsa api.telegram.org
+BOT_API_URL = os.getenv("BOT_API_URL")
+
+# Webhook: tashqi manzil, tinglanadigan host/port, maxfiy token va worker jarayonlar soni
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "1"))
+
+# Bir jarayonda bir vaqtda ishlanadigan update'lar va navbat hajmi
+UPDATE_CONCURRENCY = int(os.getenv("UPDATE_CONCURRENCY", "100"))
+UPDATE_QUEUE_SIZE = int(os.getenv("UPDATE_QUEUE_SIZE", "10000"))
+
+# Polling boshlanishidan oldin to'plangan update'larni qayta ishlash (0 - ularni tashlab yuborish)
+CATCH_UP = os.getenv("CATCH_UP", "1") == "1"
+CATCH_UP_CONCURRENCY = int(os.getenv("CATCH_UP_CONCURRENCY", "50"))
+
+# getChatMember/getChat natijalarini qayta ishlatish muddati, soniya (0 - faqat parallel so'rovlar birlashtiriladi)
+REQUEST_MEMO_TTL = float(os.getenv("REQUEST_MEMO_TTL", "0"))
+
+# Barcha chiquvchi so'rovlar: sekundiga umumiy limit, bitta chatga xabarlar tezligi va zaxirasi
+OUTGOING_RATE = float(os.getenv("OUTGOING_RATE", "25"))
+OUTGOING_CHAT_RATE = float(os.getenv("OUTGOING_CHAT_RATE", "1"))
+OUTGOING_CHAT_BURST = float(os.getenv("OUTGOING_CHAT_BURST", "3"))
+
+# Kirdi-chiqdi va reklama xabarlarini yig'ib bitta deleteMessages bilan o'chirish oynasi, soniya
+DELETE_WINDOW = float(os.getenv("DELETE_WINDOW", "1"))
+
+# Bir xil qo'shilish (xabar + chat_member) qayta yozilmaydigan oyna, soniya
+JOIN_DEDUP_WINDOW = float(os.getenv("JOIN_DEDUP_WINDOW", "60"))
+
+# /reset, /cleangroup, /izohlard: bitta so'rovda ishlanadigan qatorlar soni
+MAINTENANCE_CHUNK_SIZE = int(os.getenv("MAINTENANCE_CHUNK_SIZE", "5000"))
 
 ADMIN_ID = [1918760732, 619839487, 5246872049]
 
-bot = Bot(token=BOT_TOKEN)
-dp = Dispatcher()
\ No newline at end of file
+session = AiohttpSession(api=TelegramAPIServer.from_base(BOT_API_URL)) if BOT_API_URL else None
+bot = Bot(token=BOT_TOKEN, session=session)
+dp = Dispatcher()
@@ -1,11 +1,63 @@
 # admin_cache.py
 
 import asyncio
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Hashable, Iterable, List, Optional, Tuple, TypeVar
+
+from config import MEMBERSHIP_CACHE_SIZE, MEMBERSHIP_POSITIVE_TTL, MEMBERSHIP_NEGATIVE_TTL, LEADERBOARD_TTL, \
+    JOIN_DEDUP_WINDOW
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Concurrent loads of the same key share one call.
+
+    Waiters get the loader's result or exception. If the loading caller
+    is cancelled, the waiters are not: one of them starts the load again.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._inflight
+
+    async def run(self, key: Hashable, load: Callable[[], Awaitable[T]]) -> T:
+        future = self._inflight.get(key)
+        if future is not None:
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                return await self.run(key, load)
+
+        future = self._inflight[key] = asyncio.get_running_loop().create_future()
+        try:
+            result = await load()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as err:
+            future.set_exception(err)
+            future.exception()  # kutuvchi bo'lmasa ham "never retrieved" ogohlantirishi chiqmasin
+            raise
+        finally:
+            del self._inflight[key]
+        future.set_result(result)
+        return result
+
 
 admin_cache = {}  # {chat_id: {"admins": set(), "updated_at": datetime}}
+_admin_loading = SingleFlight()  # bir vaqtdagi so'rovlar bitta API chaqiruvga birlashadi
 
 ADMIN_CACHE_TTL = timedelta(minutes=10)  # 10 daqiqa cache muddati
+ANONYMOUS_ADMIN_ID = 1087968824  # @GroupAnonymousBot
+ADMIN_STATUSES = {"administrator", "creator"}
+
 
 async def get_admins(chat_id: int, bot) -> set:
     now = datetime.now()
@@ -15,14 +67,167 @@ async def get_admins(chat_id: int, bot) -> set:
         if now - cache_data["updated_at"] < ADMIN_CACHE_TTL:
             return cache_data["admins"]  # cache'dan olamiz
 
-    try:
-        members = await bot.get_chat_administrators(chat_id)
-        admin_ids = {m.user.id for m in members} | {1087968824}
+    async def load() -> set:
+        try:
+            members = await bot.get_chat_administrators(chat_id)
+        except Exception as e:
+            # Bo'sh to'plam qaytarilmaydi: aks holda adminlar oddiy user deb hisoblanadi
+            print(f"Adminlar ro‘yxatini olishda xatolik: {e}")
+            raise
+        admin_ids = {m.user.id for m in members} | {ANONYMOUS_ADMIN_ID}
         admin_cache[chat_id] = {
             "admins": admin_ids,
             "updated_at": now
         }
         return admin_ids
-    except Exception as e:
-        print(f"Adminlar ro‘yxatini olishda xatolik: {e}")
-        return set()
+
+    # Shu chat uchun so'rov allaqachon ketayotgan bo'lsa, o'shani kutamiz
+    return await _admin_loading.run(chat_id, load)
+
+
+def update_admin(chat_id: int, user_id: int, status: str) -> None:
+    """Apply a chat_member promote/demote to the cached admin set"""
+    cache_data = admin_cache.get(chat_id)
+    if cache_data is None:
+        return
+    if status in ADMIN_STATUSES:
+        cache_data["admins"].add(user_id)
+    else:
+        cache_data["admins"].discard(user_id)
+
+
+def invalidate_admins(chat_id: int) -> None:
+    admin_cache.pop(chat_id, None)
+
+
+class MembershipCache:
+    """Bounded LRU + TTL cache of (channel_id, user_id) subscription results.
+
+    The cached value is None for a subscribed user and the channel's
+    display name for an unsubscribed one; the two kinds have separate TTLs.
+    """
+
+    def __init__(self, maxsize: int, positive_ttl: float, negative_ttl: float):
+        self.maxsize = maxsize
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self._data = OrderedDict()  # {(channel_id, user_id): (expires_at, name | None)}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, channel_id: int, user_id: int) -> Tuple[bool, Optional[str]]:
+        key = (channel_id, user_id)
+        item = self._data.get(key)
+        if item is None or item[0] <= time.monotonic():
+            if item is not None:
+                del self._data[key]
+            self.misses += 1
+            return False, None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return True, item[1]
+
+    def set(self, channel_id: int, user_id: int, missing_name: Optional[str]) -> None:
+        ttl = self.positive_ttl if missing_name is None else self.negative_ttl
+        key = (channel_id, user_id)
+        self._data[key] = (time.monotonic() + ttl, missing_name)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate_channel(self, channel_id: int) -> None:
+        for key in [k for k in self._data if k[0] == channel_id]:
+            del self._data[key]
+
+    def stats(self) -> dict:
+        return {"size": len(self._data), "hits": self.hits, "misses": self.misses}
+
+
+membership_cache = MembershipCache(MEMBERSHIP_CACHE_SIZE, MEMBERSHIP_POSITIVE_TTL, MEMBERSHIP_NEGATIVE_TTL)
+
+
+class RecentJoins:
+    """(group_id, member_id) joins already recorded in the last ``window`` seconds.
+
+    One join arrives both as a new_chat_members message and as a
+    chat_member update; the second one is dropped before reaching the DB.
+    """
+
+    def __init__(self, window: float, maxsize: int = 100000):
+        self.window = window
+        self.maxsize = maxsize
+        self._seen = OrderedDict()  # {(group_id, member_id): expires_at}
+        self.duplicates = 0
+
+    def claim(self, group_id: int, member_ids: Iterable[int]) -> List[int]:
+        """Members not seen recently (duplicates removed); they are marked as seen"""
+        now = time.monotonic()
+        seen = self._seen
+        while seen and (len(seen) >= self.maxsize or next(iter(seen.values())) <= now):
+            seen.popitem(last=False)
+        fresh = []
+        for member_id in member_ids:
+            key = (group_id, member_id)
+            expires_at = seen.get(key)
+            if expires_at is not None and expires_at > now:
+                self.duplicates += 1
+                continue
+            seen[key] = now + self.window
+            fresh.append(member_id)
+        return fresh
+
+    def release(self, group_id: int, member_ids: Iterable[int]) -> None:
+        """Forget members whose write failed, so a repeated event is not dropped"""
+        for member_id in member_ids:
+            self._seen.pop((group_id, member_id), None)
+
+
+recent_joins = RecentJoins(JOIN_DEDUP_WINDOW)
+
+
+class LeaderboardCache:
+    """Rendered /top and /izohlar texts per group.
+
+    Entries live for ``ttl`` seconds or until invalidated by a write;
+    concurrent requests for the same group share one rendering.
+    """
+
+    def __init__(self, ttl: float, maxsize: int = 10000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = {}  # {(kind, group_id): (expires_at, text)}
+        self._loading = SingleFlight()
+        self._versions = {}  # {(kind, group_id): int} - render paytida invalidatsiyani aniqlash uchun
+
+    async def get(self, kind: str, group_id: int, render: Callable[[], Awaitable[str]]) -> str:
+        key = (kind, group_id)
+        item = self._data.get(key)
+        if item is not None and item[0] > time.monotonic():
+            return item[1]
+
+        async def load() -> str:
+            version = self._versions.get(key, 0)
+            text = await render()
+            if self._versions.get(key, 0) == version:
+                self._store(key, text)
+            return text
+
+        return await self._loading.run(key, load)
+
+    def _store(self, key: tuple, text: str) -> None:
+        now = time.monotonic()
+        if len(self._data) >= self.maxsize:
+            for k in [k for k, (expires_at, _) in self._data.items() if expires_at <= now]:
+                del self._data[k]
+        self._data[key] = (now + self.ttl, text)
+
+    def invalidate(self, kind: str, group_id: int) -> None:
+        key = (kind, group_id)
+        self._data.pop(key, None)
+        self._versions[key] = self._versions.get(key, 0) + 1
+
+
+TOP_ADDERS = "top"
+TOP_COMMENTERS = "comments"
+
+leaderboard_cache = LeaderboardCache(LEADERBOARD_TTL)
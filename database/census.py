@@ -0,0 +1,201 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from contextlib import suppress
+from typing import Dict, Optional, Set, Tuple
+
+from aiogram import Bot
+
+from config import CENSUS_REFRESH_INTERVAL, CENSUS_FLUSH_INTERVAL, GROUP_REFRESH_CONCURRENCY
+from database.pool import execute
+
+logger = logging.getLogger(__name__)
+
+BOT_PRESENT_STATUSES = ("member", "administrator", "creator", "restricted")
+SEEN_USERS_TTL = 3600  # soniya - shundan keyin user yana bir marta DB'ga yoziladi
+SEEN_USERS_MAXSIZE = 100000
+
+
+class ChatCensus:
+    __slots__ = ("member_count", "bot_status", "refreshed_at")
+
+    def __init__(self, member_count: int = 0, bot_status: bool = False, refreshed_at: float = 0.0):
+        self.member_count = member_count
+        self.bot_status = bot_status
+        self.refreshed_at = refreshed_at
+
+
+class GroupCensus:
+    """In-process census of groups (member count, bot admin status).
+
+    Each chat is refreshed from the Bot API at most once per ``interval``
+    seconds; only changed values are queued and written in batches.
+    """
+
+    def __init__(self, interval: float = CENSUS_REFRESH_INTERVAL, flush_interval: float = CENSUS_FLUSH_INTERVAL):
+        self.interval = interval
+        self.flush_interval = flush_interval
+        self.chats: Dict[int, ChatCensus] = {}
+        self._refreshing: Set[int] = set()
+        self._dirty: Dict[int, Tuple[int, bool]] = {}  # {group_id: (number, bot_status)}
+        self._rejoined: Set[int] = set()  # bot qayta qo'shilgan guruhlar - broadcast uchun faollashtiriladi
+        self._seen_users = OrderedDict()  # {user_id: expires_at}
+        self._new_users: Set[int] = set()
+        self._deferred: Optional[Set[int]] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    def is_stale(self, chat_id: int) -> bool:
+        entry = self.chats.get(chat_id)
+        return entry is None or time.monotonic() - entry.refreshed_at >= self.interval
+
+    def touch_group(self, bot: Bot, chat_id: int) -> None:
+        """Schedule a refresh if the chat's census is missing or stale"""
+        if chat_id in self._refreshing or not self.is_stale(chat_id):
+            return
+        if self._deferred is not None:
+            self._deferred.add(chat_id)
+            return
+        self._refreshing.add(chat_id)
+        self._spawn(self.refresh(bot, chat_id))
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def pause(self) -> None:
+        """Only collect stale chats until resume() (used while draining a backlog)"""
+        if self._deferred is None:
+            self._deferred = set()
+
+    def resume(self, bot: Bot, concurrency: int = GROUP_REFRESH_CONCURRENCY) -> None:
+        """Refresh every chat touched while paused once, with bounded concurrency"""
+        deferred, self._deferred = self._deferred or set(), None
+        deferred -= self._refreshing
+        if deferred:
+            self._refreshing |= deferred
+            self._spawn(self._refresh_many(bot, deferred, concurrency))
+
+    async def _refresh_many(self, bot: Bot, chat_ids: Set[int], concurrency: int) -> None:
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def refresh(chat_id: int) -> None:
+            async with semaphore:
+                await self.refresh(bot, chat_id)
+
+        await asyncio.gather(*(refresh(chat_id) for chat_id in chat_ids))
+
+    async def refresh(self, bot: Bot, chat_id: int) -> None:
+        try:
+            entry = self.chats.get(chat_id)
+            member_count = entry.member_count if entry else 0
+            with suppress(Exception):
+                member_count = await bot.get_chat_member_count(chat_id)
+
+            bot_member = await bot.get_chat_member(chat_id, bot.id)
+            bot_status = bot_member.status in ("administrator", "creator")
+            self.update(chat_id, member_count, bot_status)
+        except Exception as e:
+            logger.warning(f"Guruh {chat_id} census yangilashda xatolik: {e}")
+        finally:
+            self._refreshing.discard(chat_id)
+
+    def update(self, chat_id: int, member_count: Optional[int] = None, bot_status: Optional[bool] = None,
+               persist: bool = True) -> None:
+        """Store fresh values, queueing a DB write only when something changed"""
+        entry = self.chats.get(chat_id)
+        if entry is None:
+            entry = self.chats[chat_id] = ChatCensus()
+            changed = True
+        else:
+            changed = False
+        if member_count is not None and member_count != entry.member_count:
+            entry.member_count = member_count
+            changed = True
+        if bot_status is not None and bot_status != entry.bot_status:
+            entry.bot_status = bot_status
+            changed = True
+        entry.refreshed_at = time.monotonic()
+        if changed and persist:
+            self._dirty[chat_id] = (entry.member_count, entry.bot_status)
+
+    def observe_bot_status(self, chat_id: int, status: str) -> None:
+        """Apply a my_chat_member update and force a member count refresh"""
+        self.update(chat_id, bot_status=status in ("administrator", "creator"))
+        self.chats[chat_id].refreshed_at = 0.0
+        if status in BOT_PRESENT_STATUSES:
+            self._rejoined.add(chat_id)
+
+    def touch_user(self, user_id: int) -> None:
+        """Queue a private user for the users table (and reactivation) once per ``SEEN_USERS_TTL``"""
+        now = time.monotonic()
+        seen = self._seen_users
+        expires_at = seen.get(user_id)
+        if expires_at is not None and expires_at > now:
+            return
+        while seen and (len(seen) >= SEEN_USERS_MAXSIZE or next(iter(seen.values())) <= now):
+            seen.popitem(last=False)
+        seen[user_id] = now + SEEN_USERS_TTL
+        self._new_users.add(user_id)
+
+    def forget_user(self, user_id: int) -> None:
+        """The user was deactivated; their next private message writes status = TRUE again"""
+        self._seen_users.pop(user_id, None)
+
+    async def flush(self) -> None:
+        dirty, self._dirty = self._dirty, {}
+        rejoined, self._rejoined = self._rejoined, set()
+        new_users, self._new_users = self._new_users, set()
+        try:
+            if dirty:
+                group_ids = list(dirty)
+                await execute("""
+                    INSERT INTO groups (group_id, number, bot_status)
+                    SELECT * FROM unnest($1::bigint[], $2::int[], $3::boolean[])
+                    ON CONFLICT (group_id) DO UPDATE SET
+                        number = EXCLUDED.number,
+                        bot_status = EXCLUDED.bot_status
+                """, group_ids, [dirty[g][0] for g in group_ids], [dirty[g][1] for g in group_ids], idempotent=True)
+            if rejoined:
+                await execute("""
+                    UPDATE groups SET active = TRUE
+                    WHERE group_id = ANY($1::bigint[]) AND NOT active
+                """, list(rejoined), idempotent=True)
+        except Exception as err:
+            logger.error(f"Census groups flush error: {err}")
+            for group_id, values in dirty.items():
+                self._dirty.setdefault(group_id, values)
+            self._rejoined |= rejoined
+        try:
+            if new_users:
+                await execute("""
+                    INSERT INTO users (user_id)
+                    SELECT unnest($1::bigint[])
+                    ON CONFLICT (user_id) DO UPDATE SET status = TRUE
+                    WHERE users.status = FALSE
+                """, list(new_users), idempotent=True)
+        except Exception as err:
+            logger.error(f"Census users flush error: {err}")
+            self._new_users |= new_users
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        await self.flush()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+
+group_census = GroupCensus()
@@ -0,0 +1,113 @@
+import asyncio
+import logging
+from contextlib import suppress
+from typing import Dict, Optional
+
+from aiogram import Bot
+from aiogram.types import Chat
+
+from config import CHANNEL_INFO_REFRESH_INTERVAL
+from database.pool import execute, fetch
+
+logger = logging.getLogger(__name__)
+
+
+class ChannelInfo:
+    __slots__ = ("channel_id", "title", "username")
+
+    def __init__(self, channel_id: int, title: Optional[str], username: Optional[str]):
+        self.channel_id = channel_id
+        self.title = title
+        self.username = username
+
+    @property
+    def display_name(self) -> str:
+        if self.username:
+            return f"@{self.username}"
+        return self.title or str(self.channel_id)
+
+
+class ChannelInfoCache:
+    """Channel titles and usernames, persisted in channel_info.
+
+    Warmed from the database at startup and refreshed from the Bot API in
+    the background, so the hot path only reads memory.
+    """
+
+    def __init__(self, refresh_interval: float = CHANNEL_INFO_REFRESH_INTERVAL):
+        self.refresh_interval = refresh_interval
+        self._data: Dict[int, ChannelInfo] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def warm(self) -> None:
+        try:
+            rows = await fetch("SELECT channel_id, title, username FROM channel_info")
+            for channel_id, title, username in rows:
+                self._data[channel_id] = ChannelInfo(channel_id, title, username)
+        except Exception as err:
+            logger.error(f"Channel info warm error: {err}")
+
+    async def remember(self, chat: Chat) -> ChannelInfo:
+        """Store channel data from a Chat object we already have"""
+        info = ChannelInfo(chat.id, chat.title, chat.username)
+        old = self._data.get(chat.id)
+        self._data[chat.id] = info
+        if old is None or (old.title, old.username) != (info.title, info.username):
+            try:
+                await execute("""
+                    INSERT INTO channel_info (channel_id, title, username, updated_at)
+                    VALUES ($1, $2, $3, CURRENT_TIMESTAMP)
+                    ON CONFLICT (channel_id) DO UPDATE SET
+                        title = EXCLUDED.title,
+                        username = EXCLUDED.username,
+                        updated_at = EXCLUDED.updated_at
+                """, info.channel_id, info.title, info.username, idempotent=True)
+            except Exception as err:
+                logger.error(f"Channel info save error: {err}")
+        return info
+
+    async def get(self, bot: Bot, channel_id: int) -> ChannelInfo:
+        info = self._data.get(channel_id)
+        if info is not None:
+            return info
+        # Faqat birinchi marta (cache'da yo'q bo'lsa) API'ga murojaat qilinadi
+        return await self.remember(await bot.get_chat(channel_id))
+
+    async def get_name(self, bot: Bot, channel_id: int) -> str:
+        return (await self.get(bot, channel_id)).display_name
+
+    async def refresh_all(self, bot: Bot) -> None:
+        try:
+            rows = await fetch("SELECT DISTINCT channel_id FROM channel")
+        except Exception as err:
+            logger.error(f"Channel info refresh error: {err}")
+            return
+        for row in rows:
+            try:
+                await self.remember(await bot.get_chat(row[0]))
+            except Exception as e:
+                logger.warning(f"Kanal {row[0]} ma'lumotlarini yangilashda xatolik: {e}")
+
+    def start(self, bot: Bot, refresh: bool = True) -> None:
+        """Refresh every ``refresh_interval``; with ``refresh=False`` only re-read what another worker saved"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(bot, refresh))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    async def _run(self, bot: Bot, refresh: bool) -> None:
+        # Ishga tushganda warm() yetarli - darhol getChat so'rovlari yuborilmaydi
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            if refresh:
+                await self.refresh_all(bot)
+            else:
+                await self.warm()
+
+
+channel_info_cache = ChannelInfoCache()
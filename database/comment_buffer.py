@@ -0,0 +1,190 @@
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+
+from config import COMMENT_FLUSH_INTERVAL, COMMENT_FLUSH_SIZE
+from database.cache import leaderboard_cache, TOP_COMMENTERS
+from database.pool import transaction
+
+logger = logging.getLogger(__name__)
+
+
+class CommentBuffer:
+    """Write-behind buffer for comment statistics.
+
+    Events are aggregated in memory and written in one transaction when the
+    buffer reaches ``max_events`` or every ``interval`` seconds.
+    """
+
+    def __init__(self, interval: float = COMMENT_FLUSH_INTERVAL, max_events: int = COMMENT_FLUSH_SIZE):
+        self.interval = interval
+        self.max_events = max_events
+        self._counts: Dict[Tuple[int, int], List[int]] = {}  # {(group_id, user_id): [count, lengths]}
+        self._messages: Dict[Tuple[int, int], Tuple[int, int]] = {}  # {(group_id, message_id): (user_id, length)}
+        self._events = 0
+        self._lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+        # Metrikalar
+        self.flushes = 0
+        self.flushed_events = 0
+        self.failed_flushes = 0
+        self.last_flush_seconds = 0.0
+        self.max_flush_seconds = 0.0
+
+    @property
+    def depth(self) -> int:
+        return self._events
+
+    def add(self, group_id: int, user_id: int, message_id: int, length: int) -> None:
+        row = self._counts.setdefault((group_id, user_id), [0, 0])
+        row[0] += 1
+        row[1] += length
+        self._messages.setdefault((group_id, message_id), (user_id, length))
+        self._events += 1
+        if self._events >= self.max_events:
+            self._wakeup.set()
+
+    def has_comment(self, group_id: int, message_id: int) -> bool:
+        """Check pending (not yet flushed) comments"""
+        return (group_id, message_id) in self._messages
+
+    async def discard(self, group_id: int, user_id: Optional[int] = None) -> None:
+        """Drop pending events of a group (or of one user in it).
+
+        Waits for an in-flight flush, so a following DELETE can't be
+        overwritten by rows that were already taken out of the buffer.
+        """
+        def match(g: int, u: int) -> bool:
+            return g == group_id and (user_id is None or u == user_id)
+
+        async with self._lock:
+            for key in [k for k in self._counts if match(*k)]:
+                self._events -= self._counts.pop(key)[0]
+            for key in [k for k, (u, _) in self._messages.items() if match(k[0], u)]:
+                del self._messages[key]
+
+    async def flush(self) -> int:
+        """Write all buffered events to the database"""
+        async with self._lock:
+            if not self._counts and not self._messages:
+                return 0
+            counts, self._counts = self._counts, {}
+            messages, self._messages = self._messages, {}
+            events, self._events = self._events, 0
+
+            started = time.perf_counter()
+            try:
+                await self._write(counts, messages)
+            except asyncio.CancelledError:
+                # Olingan yozuvlar yo'qolmasin - keyingi flush yozadi
+                self._merge_back(counts, messages, events)
+                raise
+            except Exception as err:
+                logger.error(f"Comment buffer flush error: {err}")
+                self.failed_flushes += 1
+                self._merge_back(counts, messages, events)
+                raise
+
+            for group_id in {group_id for group_id, _ in counts}:
+                leaderboard_cache.invalidate(TOP_COMMENTERS, group_id)
+
+            elapsed = time.perf_counter() - started
+            self.flushes += 1
+            self.flushed_events += events
+            self.last_flush_seconds = elapsed
+            self.max_flush_seconds = max(self.max_flush_seconds, elapsed)
+            return events
+
+    def _merge_back(self, counts: dict, messages: dict, events: int) -> None:
+        for key, (count, lengths) in counts.items():
+            row = self._counts.setdefault(key, [0, 0])
+            row[0] += count
+            row[1] += lengths
+        for key, value in messages.items():
+            self._messages.setdefault(key, value)
+        self._events += events
+
+    @staticmethod
+    async def _write(counts: dict, messages: dict) -> None:
+        count_keys = list(counts)
+        message_keys = list(messages)
+        async with transaction() as conn:
+            if count_keys:
+                await conn.execute("""
+                    INSERT INTO user_comments (group_id, user_id, count, lengths)
+                    SELECT * FROM unnest($1::bigint[], $2::bigint[], $3::int[], $4::int[])
+                    ON CONFLICT (group_id, user_id)
+                    DO UPDATE SET
+                        count = user_comments.count + EXCLUDED.count,
+                        lengths = user_comments.lengths + EXCLUDED.lengths
+                """,
+                    [k[0] for k in count_keys],
+                    [k[1] for k in count_keys],
+                    [counts[k][0] for k in count_keys],
+                    [counts[k][1] for k in count_keys])
+
+            if message_keys:
+                group_ids = [k[0] for k in message_keys]
+                message_ids = [k[1] for k in message_keys]
+                await conn.execute("""
+                    INSERT INTO comment_messages (group_id, user_id, message_id, length)
+                    SELECT * FROM unnest($1::bigint[], $2::bigint[], $3::bigint[], $4::int[])
+                    ON CONFLICT (group_id, message_id) DO NOTHING
+                """,
+                    group_ids,
+                    [messages[k][0] for k in message_keys],
+                    message_ids,
+                    [messages[k][1] for k in message_keys])
+
+                await conn.execute("""
+                    INSERT INTO all_comment (group_id, message_id)
+                    SELECT * FROM unnest($1::bigint[], $2::bigint[])
+                    ON CONFLICT (group_id, message_id) DO NOTHING
+                """, group_ids, message_ids)
+
+    def stats(self) -> dict:
+        return {
+            "depth": self.depth,
+            "flushes": self.flushes,
+            "flushed_events": self.flushed_events,
+            "failed_flushes": self.failed_flushes,
+            "last_flush_seconds": self.last_flush_seconds,
+            "max_flush_seconds": self.max_flush_seconds,
+        }
+
+    def start(self) -> None:
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background task and flush what is left"""
+        if self._task is not None:
+            # Bekor qilinmaydi: yozilayotgan flush oxirigacha yetishi kerak
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush()
+        logger.info(f"Comment buffer stopped: {self.stats()}")
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if self._stopping:
+                return
+            try:
+                await self.flush()
+            except Exception:
+                await asyncio.sleep(self.interval)
+
+
+comment_buffer = CommentBuffer()
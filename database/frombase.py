@@ -2,99 +2,219 @@ import asyncio
 from typing import List, Tuple, Optional
 from aiogram import Bot
 from aiogram.exceptions import TelegramBadRequest
-from aiogram.types import Chat, Message
-from config import cur, conn
+from aiogram.types import Message
+from config import SUBSCRIPTION_CHECK_CONCURRENCY, SUBSCRIPTION_CHECK_TIMEOUT, MAINTENANCE_CHUNK_SIZE
+from database.cache import membership_cache, leaderboard_cache, recent_joins, TOP_ADDERS
+from database.channel_info import channel_info_cache
+from database.policy import group_policies
+from database.pool import init_pool, transaction, execute, execute_chunked, fetch, fetchrow, fetchval, Progress
+
+MIN_BIGINT = -2 ** 63
+
+# Bot API limitlarini hurmat qilish uchun barcha obuna tekshiruvlari uchun umumiy semafor
+_subscription_semaphore = asyncio.Semaphore(SUBSCRIPTION_CHECK_CONCURRENCY)
 
 
 # database
 async def init_db():
     """Initialize database tables"""
+    await init_pool()
     try:
-        # Kanal ro'yxati uchun jadval
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS channel (
-            group_id BIGINT NOT NULL,
-            channel_id BIGINT NOT NULL,
-            PRIMARY KEY (group_id, channel_id)
-        )""")
-
-        # Foydalanuvchi tomonidan qo'shilgan odamlar
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS add_members (
-            group_id BIGINT NOT NULL,
-            user_id BIGINT NOT NULL,
-            member BIGINT NOT NULL,
-            added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            PRIMARY KEY (group_id, member))
-            """)
-
-        # Har bir guruh uchun majburiy qo'shish talabi
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS group_requirement (
-            group_id BIGINT PRIMARY KEY,
-            required_count INTEGER NOT NULL)
+        async with transaction() as conn:
+            # Kanal ro'yxati uchun jadval
+            await conn.execute("""
+            CREATE TABLE IF NOT EXISTS channel (
+                group_id BIGINT NOT NULL,
+                channel_id BIGINT NOT NULL,
+                PRIMARY KEY (group_id, channel_id)
+            )""")
+
+            # Kanal nomi va username'i (cache uchun)
+            await conn.execute("""
+            CREATE TABLE IF NOT EXISTS channel_info (
+                channel_id BIGINT PRIMARY KEY,
+                title TEXT,
+                username TEXT,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )""")
+
+            # Guruhda taqiqlangan domenlar
+            await conn.execute("""
+            CREATE TABLE IF NOT EXISTS blocked_domains (
+                group_id BIGINT NOT NULL,
+                domain TEXT NOT NULL,
+                PRIMARY KEY (group_id, domain)
+            )""")
+
+            # Foydalanuvchi tomonidan qo'shilgan odamlar
+            await conn.execute("""
+            CREATE TABLE IF NOT EXISTS add_members (
+                group_id BIGINT NOT NULL,
+                user_id BIGINT NOT NULL,
+                member BIGINT NOT NULL,
+                added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (group_id, member))
+                """)
+
+            # Har bir foydalanuvchi qo'shgan odamlar soni (add_members bilan birga yangilanadi)
+            await conn.execute("""
+            CREATE TABLE IF NOT EXISTS add_counts (
+                group_id BIGINT NOT NULL,
+                user_id BIGINT NOT NULL,
+                added_count INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (group_id, user_id))
+                """)
+            await conn.execute("""
+            CREATE INDEX IF NOT EXISTS add_counts_top_idx
+                ON add_counts (group_id, added_count DESC)
+                """)
+
+            # Eski ma'lumotlar uchun hisoblagichlarni bir marta to'ldirish
+            await conn.execute("""
+            INSERT INTO add_counts (group_id, user_id, added_count)
+            SELECT group_id, user_id, COUNT(*)
+            FROM add_members
+            WHERE NOT EXISTS (SELECT 1 FROM add_counts)
+            GROUP BY group_id, user_id
+            ON CONFLICT (group_id, user_id) DO NOTHING
+                """)
+
+            # Har bir guruh uchun majburiy qo'shish talabi
+            await conn.execute("""
+            CREATE TABLE IF NOT EXISTS group_requirement (
+                group_id BIGINT PRIMARY KEY,
+                required_count INTEGER NOT NULL)
+                """)
+
+            # Foydalanuvchining statusi: talab bajarilganmi yoki yo'q
+            await conn.execute("""
+            CREATE TABLE IF NOT EXISTS user_requirement (
+                group_id BIGINT NOT NULL,
+                user_id BIGINT NOT NULL,
+                status BOOLEAN NOT NULL DEFAULT FALSE,
+                PRIMARY KEY (group_id, user_id))
+                """)
+
+            # Guruhlar jadvali
+            await conn.execute("""
+            CREATE TABLE IF NOT EXISTS groups (
+                group_id BIGINT PRIMARY KEY,
+                bot_status BOOLEAN NOT NULL DEFAULT TRUE,
+                number INTEGER DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                active BOOLEAN NOT NULL DEFAULT TRUE)
+                """)
+            # Broadcast yetkazib bo'lmagan guruhlar (bot chiqarilgan) - bot_status'dan alohida
+            await conn.execute("ALTER TABLE groups ADD COLUMN IF NOT EXISTS active BOOLEAN NOT NULL DEFAULT TRUE")
+
+            # Foydalanuvchilar jadvali
+            await conn.execute("""
+            CREATE TABLE IF NOT EXISTS users (
+                user_id BIGINT PRIMARY KEY,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                status BOOLEAN NOT NULL DEFAULT TRUE)
+                """)
+
+            # Kechiktirilgan ishlar (ogohlantirishni o'chirish, cheklovni olib tashlash)
+            await conn.execute("""
+            CREATE TABLE IF NOT EXISTS scheduled_jobs (
+                id BIGSERIAL PRIMARY KEY,
+                run_at TIMESTAMPTZ NOT NULL,
+                kind TEXT NOT NULL,
+                chat_id BIGINT NOT NULL,
+                user_id BIGINT,
+                message_id BIGINT,
+                payload JSONB NOT NULL DEFAULT '{}'::jsonb
+            )""")
+
+            # Ommaviy xabar yuborish vazifalari (qayta ishga tushganda davom etish uchun)
+            await conn.execute("""
+            CREATE TABLE IF NOT EXISTS broadcast_jobs (
+                id BIGSERIAL PRIMARY KEY,
+                admin_id BIGINT NOT NULL,
+                from_chat_id BIGINT NOT NULL,
+                message_id BIGINT NOT NULL,
+                mode TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'running',
+                stage TEXT NOT NULL DEFAULT 'groups',
+                last_id BIGINT,
+                sent INTEGER NOT NULL DEFAULT 0,
+                failed INTEGER NOT NULL DEFAULT 0,
+                progress_message_id BIGINT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )""")
+
+            # Foydalanuvchi ismlari (yangilanishlardan passiv yig'iladi)
+            await conn.execute("""
+            CREATE TABLE IF NOT EXISTS user_profiles (
+                user_id BIGINT PRIMARY KEY,
+                full_name TEXT NOT NULL,
+                username TEXT,
+                last_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )""")
+
+            # Foydalanuvchilar izohlari
+            await conn.execute("""
+            CREATE TABLE IF NOT EXISTS user_comments (
+                group_id BIGINT NOT NULL,
+                user_id BIGINT NOT NULL,
+                count INTEGER NOT NULL DEFAULT 0,
+                lengths INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (group_id, user_id)
+            )""")
+
+            # Foydalanuvchilar izohlari
+            await conn.execute("""
+            CREATE TABLE IF NOT EXISTS comment_messages (
+                group_id BIGINT NOT NULL,
+                user_id BIGINT NOT NULL,
+                message_id BIGINT NOT NULL,  -- foydalanuvchi yozgan izohning ID’si
+                length INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (group_id, message_id)
+            );
             """)
 
-        # Foydalanuvchining statusi: talab bajarilganmi yoki yo'q
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS user_requirement (
-            group_id BIGINT NOT NULL,
-            user_id BIGINT NOT NULL,
-            status BOOLEAN NOT NULL DEFAULT FALSE,
-            PRIMARY KEY (group_id, user_id))
+            # Foydalanuvchilar izohlari
+            await conn.execute("""
+            CREATE TABLE IF NOT EXISTS all_comment (
+                group_id BIGINT NOT NULL,
+                message_id BIGINT NOT NULL,
+                PRIMARY KEY (group_id, message_id)
+            );
             """)
 
-        # Guruhlar jadvali
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS groups (
-            group_id BIGINT PRIMARY KEY,
-            bot_status BOOLEAN NOT NULL DEFAULT TRUE,
-            number INTEGER DEFAULT 0,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)
-            """)
+            # Har bir xabardagi talab tekshiruvi bitta so'rovda: yana nechta odam qo'shish kerak (0 - bajarilgan)
+            await conn.execute("""
+            CREATE OR REPLACE FUNCTION requirement_left(p_group_id BIGINT, p_user_id BIGINT, p_required INTEGER)
+            RETURNS INTEGER AS $$
+            DECLARE
+                v_status BOOLEAN;
+                v_added INTEGER;
+            BEGIN
+                SELECT status INTO v_status FROM user_requirement
+                WHERE group_id = p_group_id AND user_id = p_user_id;
+                IF v_status THEN
+                    RETURN 0;
+                END IF;
+
+                SELECT added_count INTO v_added FROM add_counts
+                WHERE group_id = p_group_id AND user_id = p_user_id;
+                v_added := COALESCE(v_added, 0);
+                IF v_added < p_required THEN
+                    RETURN p_required - v_added;
+                END IF;
 
-        # Foydalanuvchilar jadvali
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            user_id BIGINT PRIMARY KEY,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            status BOOLEAN NOT NULL DEFAULT TRUE)
+                INSERT INTO user_requirement (group_id, user_id, status)
+                VALUES (p_group_id, p_user_id, TRUE)
+                ON CONFLICT (group_id, user_id) DO UPDATE SET status = TRUE;
+                RETURN 0;
+            END;
+            $$ LANGUAGE plpgsql
             """)
 
-        # Foydalanuvchilar izohlari
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS user_comments (
-            group_id BIGINT NOT NULL,
-            user_id BIGINT NOT NULL,
-            count INTEGER NOT NULL DEFAULT 0,
-            lengths INTEGER NOT NULL DEFAULT 0,
-            PRIMARY KEY (group_id, user_id)
-        )""")
-
-        # Foydalanuvchilar izohlari
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS comment_messages (
-            group_id BIGINT NOT NULL,
-            user_id BIGINT NOT NULL,
-            message_id BIGINT NOT NULL,  -- foydalanuvchi yozgan izohning ID’si
-            length INTEGER NOT NULL DEFAULT 0,
-            PRIMARY KEY (group_id, message_id)
-        );
-        """)
-
-        # Foydalanuvchilar izohlari
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS all_comment (
-            group_id BIGINT NOT NULL,
-            message_id BIGINT NOT NULL,
-            PRIMARY KEY (group_id, message_id)
-        );
-        """)
-        conn.commit()
-
     except Exception as err:
         print(f"Database initialization error: {err}")
-        conn.rollback()
         raise
 
 
@@ -102,131 +222,143 @@ async def init_db():
 async def add_channel(group_id: int, channel_id: int) -> None:
     """Add channel to group's required channels"""
     try:
-        cur.execute(
-            "INSERT INTO channel (group_id, channel_id) VALUES (%s, %s)",
-            (group_id, channel_id)
+        await execute(
+            "INSERT INTO channel (group_id, channel_id) VALUES ($1, $2)",
+            group_id, channel_id
         )
-        conn.commit()
+        group_policies.add_channel(group_id, channel_id)
+        membership_cache.invalidate_channel(channel_id)
     except Exception as err:
         print(f"add_channel error: {err}")
-        conn.rollback()
         raise
 
 
 async def remove_channel(group_id: int, channel_id: int) -> None:
     """Remove channel from group's required channels"""
     try:
-        cur.execute(
-            "DELETE FROM channel WHERE group_id = %s AND channel_id = %s",
-            (group_id, channel_id)
+        await execute(
+            "DELETE FROM channel WHERE group_id = $1 AND channel_id = $2",
+            group_id, channel_id, idempotent=True
         )
-        conn.commit()
+        group_policies.remove_channel(group_id, channel_id)
+        membership_cache.invalidate_channel(channel_id)
     except Exception as err:
         print(f"remove_channel error: {err}")
-        conn.rollback()
         raise
 
 
 async def get_required_channels(group_id: int) -> List[int]:
     """Get list of required channels for group"""
+    return list(group_policies.get(group_id).channels)
+
+
+# -------------------- REQUIREMENT FUNCTIONS --------------------
+async def set_required_count(group_id: int, required_count: int) -> None:
+    """Set how many members each user must add in group (0 disables it)"""
     try:
-        cur.execute(
-            "SELECT channel_id FROM channel WHERE group_id = %s",
-            (group_id,)
-        )
-        rows = cur.fetchall()
-        return [row[0] for row in rows] if rows else []
+        await execute("""
+            INSERT INTO group_requirement (group_id, required_count)
+            VALUES ($1, $2)
+            ON CONFLICT (group_id) DO UPDATE SET required_count = EXCLUDED.required_count
+        """, group_id, required_count, idempotent=True)
+        group_policies.set_required_count(group_id, required_count)
     except Exception as err:
-        print(f"get_required_channels error: {err}")
-        return []
+        print(f"set_required_count error: {err}")
+        raise
 
 
 # -------------------- MEMBER FUNCTIONS --------------------
-async def add_member(message: Message, member_id: int) -> None:
-    """Add member brought by user to database"""
-    group_id = message.chat.id
-    user_id = message.from_user.id
+async def add_members(group_id: int, user_id: int, member_ids: List[int]) -> Optional[int]:
+    """Add members brought by user to database; returns the user's new total (None if nothing new)"""
+    member_ids = recent_joins.claim(group_id, dict.fromkeys(member_ids))
+    if not member_ids:
+        return None
+    required_count = group_policies.get(group_id).required_count
 
     try:
-        # Check if this combination already exists
-        cur.execute("""
-            SELECT 1 FROM add_members 
-            WHERE group_id = %s AND user_id = %s AND member = %s
-        """, (group_id, user_id, member_id))
-        exists = cur.fetchone()
-
-        if not exists:
-            # Add new member
-            cur.execute("""
+        # Insert members, bump the user's counter and mark the requirement in one statement
+        added_count = await fetchval("""
+            WITH ins AS (
                 INSERT INTO add_members (group_id, user_id, member)
-                VALUES (%s, %s, %s)
-            """, (group_id, user_id, member_id))
-
-            # Get count of members added by this user
-            cur.execute("""
-                SELECT COUNT(*) FROM add_members 
-                WHERE group_id = %s AND user_id = %s
-            """, (group_id, user_id))
-            added_count = cur.fetchone()[0]
-
-            # Get required count for group
-            cur.execute("""
-                SELECT required_count FROM group_requirement 
-                WHERE group_id = %s
-            """, (group_id,))
-            required_row = cur.fetchone()
-            required_count = required_row[0] if required_row else 0
-
-            # Update user status if requirement met
-            if added_count >= required_count:
-                cur.execute("""
-                    INSERT INTO user_requirement (group_id, user_id, status)
-                    VALUES (%s, %s, TRUE)
-                    ON CONFLICT (group_id, user_id)
-                    DO UPDATE SET status = EXCLUDED.status
-                """, (group_id, user_id))
-        conn.commit()
+                SELECT $1, $2, member FROM unnest($3::bigint[]) AS member
+                ON CONFLICT (group_id, member) DO NOTHING
+                RETURNING member
+            ), counts AS (
+                INSERT INTO add_counts (group_id, user_id, added_count)
+                SELECT $1, $2, COUNT(*) FROM ins HAVING COUNT(*) > 0
+                ON CONFLICT (group_id, user_id)
+                DO UPDATE SET added_count = add_counts.added_count + EXCLUDED.added_count
+                RETURNING added_count
+            ), requirement AS (
+                INSERT INTO user_requirement (group_id, user_id, status)
+                SELECT $1, $2, TRUE FROM counts WHERE added_count >= $4
+                ON CONFLICT (group_id, user_id)
+                DO UPDATE SET status = EXCLUDED.status
+            )
+            SELECT added_count FROM counts
+        """, group_id, user_id, member_ids, required_count, idempotent=False)
     except Exception as err:
-        print(f"add_member error: {err}")
-        conn.rollback()
+        recent_joins.release(group_id, member_ids)
+        print(f"add_members error: {err}")
         raise
 
+    if added_count is not None:
+        leaderboard_cache.invalidate(TOP_ADDERS, group_id)
+    return added_count
+
 
 async def remove_members_by_user(group_id: int, user_id: int) -> None:
     """Remove all members added by specific user"""
     try:
-        cur.execute(
-            "DELETE FROM add_members WHERE group_id = %s AND user_id = %s",
-            (group_id, user_id)
-        )
-        cur.execute("""
-            INSERT INTO user_requirement (group_id, user_id, status)
-            VALUES (%s, %s, FALSE)
-            ON CONFLICT (group_id, user_id) 
-            DO UPDATE SET status = EXCLUDED.status
-        """, (group_id, user_id))
-        conn.commit()
+        async with transaction() as conn:
+            await conn.execute(
+                "DELETE FROM add_members WHERE group_id = $1 AND user_id = $2",
+                group_id, user_id
+            )
+            await conn.execute(
+                "DELETE FROM add_counts WHERE group_id = $1 AND user_id = $2",
+                group_id, user_id
+            )
+            await conn.execute("""
+                INSERT INTO user_requirement (group_id, user_id, status)
+                VALUES ($1, $2, FALSE)
+                ON CONFLICT (group_id, user_id) 
+                DO UPDATE SET status = EXCLUDED.status
+            """, group_id, user_id)
+        leaderboard_cache.invalidate(TOP_ADDERS, group_id)
     except Exception as err:
         print(f"remove_members_by_user error: {err}")
-        conn.rollback()
         raise
 
 
-async def remove_all_members(group_id: int) -> None:
-    """Remove all members from group"""
+async def remove_all_members(group_id: int, progress: Optional[Progress] = None) -> int:
+    """Remove all members from group in chunks; returns the number of affected rows"""
     try:
-        cur.execute(
-            "DELETE FROM add_members WHERE group_id = %s",
-            (group_id,)
-        )
-        cur.execute(
-            "UPDATE user_requirement SET status = FALSE WHERE group_id = %s",
-            (group_id,)
-        )
-        conn.commit()
+        total = await execute_chunked("""
+            DELETE FROM add_members WHERE group_id = $1 AND member IN (
+                SELECT member FROM add_members WHERE group_id = $1 LIMIT $2)
+        """, group_id, progress=progress)
+        total += await execute_chunked("""
+            DELETE FROM add_counts WHERE group_id = $1 AND user_id IN (
+                SELECT user_id FROM add_counts WHERE group_id = $1 LIMIT $2)
+        """, group_id, progress=progress)
+        total += await execute_chunked("""
+            UPDATE user_requirement SET status = FALSE WHERE group_id = $1 AND user_id IN (
+                SELECT user_id FROM user_requirement WHERE group_id = $1 AND status LIMIT $2)
+        """, group_id, progress=progress)
+
+        # Tozalash paytida qo'shilib qolgan qatorlar bitta tranzaksiyada olib tashlanadi
+        async with transaction() as conn:
+            await conn.execute("DELETE FROM add_members WHERE group_id = $1", group_id)
+            await conn.execute("DELETE FROM add_counts WHERE group_id = $1", group_id)
+            await conn.execute(
+                "UPDATE user_requirement SET status = FALSE WHERE group_id = $1 AND status",
+                group_id
+            )
+        leaderboard_cache.invalidate(TOP_ADDERS, group_id)
+        return total
     except Exception as err:
         print(f"remove_all_members error: {err}")
-        conn.rollback()
         raise
 
 
@@ -236,53 +368,51 @@ async def get_user_status(message: Message) -> bool:
     user_id = message.from_user.id
 
     try:
-        cur.execute("""
+        row = await fetchrow("""
             SELECT status FROM user_requirement 
-            WHERE group_id = %s AND user_id = %s
-        """, (group_id, user_id))
-        row = cur.fetchone()
+            WHERE group_id = $1 AND user_id = $2
+        """, group_id, user_id)
         return bool(row[0]) if row else False
     except Exception as err:
         print(f"get_user_status error: {err}")
         return False
 
 
-async def update_user_status(message: Message) -> None:
-    """Update all users' statuses in group"""
-    group_id = message.chat.id
-
+async def update_user_status(group_id: int, progress: Optional[Progress] = None) -> int:
+    """Recompute all users' statuses in group; returns the number of users checked"""
     try:
-        # Get required count for group
-        cur.execute("""
-            SELECT required_count FROM group_requirement WHERE group_id = %s
-        """, (group_id,))
-        required_row = cur.fetchone()
-        if not required_row:
-            return
-        required_count = required_row[0]
-
-        # Get member counts for all users
-        cur.execute("""
-            SELECT user_id, COUNT(member) as member_count
-            FROM add_members
-            WHERE group_id = %s
-            GROUP BY user_id
-        """, (group_id,))
-        user_member_counts = cur.fetchall()
-
-        # Update statuses
-        for user_id, member_count in user_member_counts:
-            status = member_count >= required_count
-            cur.execute("""
-                INSERT INTO user_requirement (group_id, user_id, status)
-                VALUES (%s, %s, %s)
-                ON CONFLICT (group_id, user_id) 
-                DO UPDATE SET status = EXCLUDED.status
-            """, (group_id, user_id, status))
-        conn.commit()
+        required_count = await fetchval(
+            "SELECT required_count FROM group_requirement WHERE group_id = $1", group_id
+        )
+        if required_count is None:
+            return 0
+
+        # Har bir chunk bitta INSERT ... SELECT; holati o'zgarmaganlar qayta yozilmaydi
+        total, last_user_id = 0, MIN_BIGINT
+        while True:
+            count, last = await fetchrow("""
+                WITH chunk AS (
+                    SELECT user_id, added_count FROM add_counts
+                    WHERE group_id = $1 AND user_id > $2
+                    ORDER BY user_id
+                    LIMIT $3
+                ), upsert AS (
+                    INSERT INTO user_requirement (group_id, user_id, status)
+                    SELECT $1, user_id, added_count >= $4 FROM chunk
+                    ON CONFLICT (group_id, user_id)
+                    DO UPDATE SET status = EXCLUDED.status
+                    WHERE user_requirement.status IS DISTINCT FROM EXCLUDED.status
+                )
+                SELECT COUNT(*), MAX(user_id) FROM chunk
+            """, group_id, last_user_id, MAINTENANCE_CHUNK_SIZE, required_count)
+            total += count
+            if progress is not None and count:
+                await progress(count)
+            if count < MAINTENANCE_CHUNK_SIZE:
+                return total
+            last_user_id = last
     except Exception as err:
         print(f"update_user_status error: {err}")
-        conn.rollback()
         raise
 
 
@@ -290,15 +420,13 @@ async def update_user_status(message: Message) -> None:
 async def get_top_adders(group_id: int, limit: int = 20) -> List[Tuple[int, int]]:
     """Get top members who added most users"""
     try:
-        cur.execute("""
-            SELECT user_id, COUNT(*) as total
-            FROM add_members
-            WHERE group_id = %s
-            GROUP BY user_id
-            ORDER BY total DESC
-            LIMIT %s
-        """, (group_id, limit))
-        return cur.fetchall()
+        return await fetch("""
+            SELECT user_id, added_count
+            FROM add_counts
+            WHERE group_id = $1 AND added_count > 0
+            ORDER BY added_count DESC
+            LIMIT $2
+        """, group_id, limit)
     except Exception as err:
         print(f"get_top_adders error: {err}")
         return []
@@ -307,12 +435,11 @@ async def get_top_adders(group_id: int, limit: int = 20) -> List[Tuple[int, int]
 async def get_total_by_user(group_id: int, user_id: int) -> int:
     """Get total members added by user"""
     try:
-        cur.execute("""
-            SELECT COUNT(*) FROM add_members
-            WHERE group_id = %s AND user_id = %s
-        """, (group_id, user_id))
-        row = cur.fetchone()
-        return row[0] if row else 0
+        total = await fetchval("""
+            SELECT added_count FROM add_counts
+            WHERE group_id = $1 AND user_id = $2
+        """, group_id, user_id)
+        return total or 0
     except Exception as err:
         print(f"get_total_by_user error: {err}")
         return 0
@@ -323,7 +450,7 @@ async def notify_admins_about_bot_rights(bot: Bot, group_id: int, channel_id: in
     """Notify group admins about missing bot admin rights in channel"""
     try:
         admins = await bot.get_chat_administrators(group_id)
-        channel: Chat = await bot.get_chat(channel_id)
+        channel = await channel_info_cache.get(bot, channel_id)
 
         for admin in admins:
             user = admin.user
@@ -344,34 +471,57 @@ async def notify_admins_about_bot_rights(bot: Bot, group_id: int, channel_id: in
         print(f"[Admin fetch error]: {e}")
 
 
+async def _check_channel_subscription(bot: Bot, group_id: int, channel_id: int, user_id: int) -> Optional[str]:
+    """Return channel name if user is not subscribed to it, otherwise None"""
+    hit, missing_name = membership_cache.get(channel_id, user_id)
+    if hit:
+        return missing_name
+
+    bot_not_admin = False
+    async with _subscription_semaphore:
+        try:
+            member = await asyncio.wait_for(
+                bot.get_chat_member(channel_id, user_id), SUBSCRIPTION_CHECK_TIMEOUT
+            )
+            if member.status in {"member", "administrator", "creator"}:
+                membership_cache.set(channel_id, user_id, None)
+            else:
+                missing_name = await asyncio.wait_for(
+                    channel_info_cache.get_name(bot, channel_id), SUBSCRIPTION_CHECK_TIMEOUT
+                )
+                membership_cache.set(channel_id, user_id, missing_name)
+                return missing_name
+        except TelegramBadRequest as e:
+            if "user not found" not in str(e):
+                bot_not_admin = True
+        except asyncio.TimeoutError:
+            print(f"[Subscription check timeout]: channel {channel_id}")
+        except Exception as e:
+            print(f"[Subscription check error]: {e}")
+
+    # Adminlarga xabar yuborish semafor tashqarisida
+    if bot_not_admin:
+        await notify_admins_about_bot_rights(bot, group_id, channel_id)
+    return None
+
+
 async def is_user_subscribed_all_channels(message: Message) -> Tuple[bool, List[str]]:
     """Check if user is subscribed to all required channels"""
     bot = message.bot
     user_id = message.from_user.id
     group_id = message.chat.id
-    unsubscribed_channels = []
 
     try:
         channels = await get_required_channels(group_id)
         if not channels:
             return True, []  # No channels required for this group
 
-        for channel_id in channels:
-            try:
-                member = await bot.get_chat_member(channel_id, user_id)
-                if member.status not in {"member", "administrator", "creator"}:
-                    channel = await bot.get_chat(channel_id)
-                    unsubscribed_channels.append(
-                        f"@{channel.username}" if channel.username
-                        else channel.title
-                    )
-            except TelegramBadRequest as e:
-                if "user not found" in str(e):
-                    continue
-                else:
-                    await notify_admins_about_bot_rights(bot, group_id, channel_id)
-            except Exception as e:
-                print(f"[Subscription check error]: {e}")
+        # Barcha kanallar bir vaqtda tekshiriladi, natija tartibi kanallar tartibida
+        results = await asyncio.gather(*(
+            _check_channel_subscription(bot, group_id, channel_id, user_id)
+            for channel_id in channels
+        ))
+        unsubscribed_channels = [name for name in results if name is not None]
 
         return (not unsubscribed_channels), unsubscribed_channels
     except Exception as e:
@@ -384,46 +534,18 @@ async def check_user_requirement(message: Message) -> Tuple[bool, Optional[int]]
     group_id = message.chat.id
     user_id = message.from_user.id
 
+    required_count = group_policies.get(group_id).required_count
+    if not required_count:
+        return True, None  # No requirements for this group
+
     try:
-        # Check if group has requirements
-        cur.execute("""
-            SELECT required_count FROM group_requirement 
-            WHERE group_id = %s
-        """, (group_id,))
-        required_row = cur.fetchone()
-        if not required_row:
-            return True, None  # No requirements for this group
-
-        required_count = required_row[0]
-
-        # Check user status
-        cur.execute("""
-            SELECT status FROM user_requirement 
-            WHERE group_id = %s AND user_id = %s
-        """, (group_id, user_id))
-        status_row = cur.fetchone()
-        if status_row and status_row[0]:
-            return True, None  # Already met requirements
-
-        # Count members added by user
-        cur.execute("""
-            SELECT COUNT(*) FROM add_members 
-            WHERE group_id = %s AND user_id = %s
-        """, (group_id, user_id))
-        added_count = cur.fetchone()[0]
-
-        if added_count >= required_count:
-            # Update status
-            cur.execute("""
-                INSERT INTO user_requirement (group_id, user_id, status)
-                VALUES (%s, %s, TRUE)
-                ON CONFLICT(group_id, user_id) 
-                DO UPDATE SET status = TRUE
-            """, (group_id, user_id))
-            conn.commit()
+        # Status, qo'shganlar soni va kerak bo'lsa statusni yozish - requirement_left() ichida, bitta so'rovda
+        need_number = await fetchval(
+            "SELECT requirement_left($1, $2, $3)", group_id, user_id, required_count
+        )
+        if need_number <= 0:
             return True, None
-        else:
-            return False, (required_count - added_count)
+        return False, need_number
     except Exception as err:
         print(f"check_user_requirement error: {err}")
-        return True, None
\ No newline at end of file
+        return True, None
@@ -0,0 +1,64 @@
+from typing import Dict, Tuple
+
+from database.pool import fetch
+
+
+class GroupPolicy:
+    """Group's access rules: required add count and required channels"""
+    __slots__ = ("required_count", "channels")
+
+    def __init__(self, required_count: int = 0, channels: Tuple[int, ...] = ()):
+        self.required_count = required_count
+        self.channels = channels
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.required_count and not self.channels
+
+
+EMPTY_POLICY = GroupPolicy()
+
+
+class PolicyStore:
+    """In-memory snapshot of group_requirement and channel tables.
+
+    Loaded in bulk at startup; /majbur, /majburoff, /kanal and /kanald
+    update it through the database functions that change those tables.
+    """
+
+    def __init__(self):
+        self._policies: Dict[int, GroupPolicy] = {}
+
+    async def load(self) -> None:
+        policies: Dict[int, GroupPolicy] = {}
+        for group_id, required_count in await fetch("SELECT group_id, required_count FROM group_requirement"):
+            policies[group_id] = GroupPolicy(required_count)
+        for group_id, channel_id in await fetch("SELECT group_id, channel_id FROM channel"):
+            policy = policies.setdefault(group_id, GroupPolicy())
+            policy.channels += (channel_id,)
+        self._policies = policies
+
+    def get(self, group_id: int) -> GroupPolicy:
+        return self._policies.get(group_id, EMPTY_POLICY)
+
+    def _ensure(self, group_id: int) -> GroupPolicy:
+        policy = self._policies.get(group_id)
+        if policy is None:
+            policy = self._policies[group_id] = GroupPolicy()
+        return policy
+
+    def set_required_count(self, group_id: int, required_count: int) -> None:
+        self._ensure(group_id).required_count = required_count
+
+    def add_channel(self, group_id: int, channel_id: int) -> None:
+        policy = self._ensure(group_id)
+        if channel_id not in policy.channels:
+            policy.channels += (channel_id,)
+
+    def remove_channel(self, group_id: int, channel_id: int) -> None:
+        policy = self._policies.get(group_id)
+        if policy is not None:
+            policy.channels = tuple(c for c in policy.channels if c != channel_id)
+
+
+group_policies = PolicyStore()
@@ -0,0 +1,177 @@
+"""asyncpg pool shared by the bot and the module-level query helpers.
+
+When a connection is lost, the helpers recreate the pool once. Reads
+(fetch, fetchrow, fetchval) are then retried on the new pool. Writes are
+retried only with ``idempotent=True``: the first attempt may already
+have committed, and a statement that adds to counters must not run
+twice. Writes inside ``transaction()`` are never retried or reconnected.
+"""
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, List, Optional, Sequence
+
+import asyncpg
+
+from config import (
+    DATABASE, USERNAME, PASSWORD, DB_HOST, DB_PORT,
+    DB_POOL_MIN, DB_POOL_MAX, DB_HEALTH_INTERVAL, MAINTENANCE_CHUNK_SIZE
+)
+
+logger = logging.getLogger(__name__)
+
+_pool: Optional[asyncpg.Pool] = None
+_health_task: Optional[asyncio.Task] = None
+_reconnect_lock = asyncio.Lock()
+
+Progress = Callable[[int], Awaitable[None]]
+
+# Ulanish uzilganda qayta urinish kerak bo'lgan xatolar
+RECONNECT_ERRORS = (
+    asyncpg.exceptions.PostgresConnectionError,
+    asyncpg.exceptions.CannotConnectNowError,
+    asyncpg.exceptions.AdminShutdownError,
+    ConnectionError,
+)
+
+
+async def _create_pool() -> asyncpg.Pool:
+    return await asyncpg.create_pool(
+        database=DATABASE,
+        user=USERNAME,
+        password=PASSWORD,
+        host=DB_HOST,
+        port=DB_PORT,
+        min_size=DB_POOL_MIN,
+        max_size=DB_POOL_MAX,
+    )
+
+
+async def init_pool() -> asyncpg.Pool:
+    """Create the connection pool and start the health check"""
+    global _pool, _health_task
+    if _pool is None:
+        _pool = await _create_pool()
+    if _health_task is None and DB_HEALTH_INTERVAL > 0:
+        _health_task = asyncio.create_task(_health_loop())
+    return _pool
+
+
+async def close_pool() -> None:
+    """Stop the health check and close every pooled connection"""
+    global _pool, _health_task
+    if _health_task is not None:
+        _health_task.cancel()
+        _health_task = None
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+def get_pool() -> asyncpg.Pool:
+    if _pool is None:
+        raise RuntimeError("Database pool is not initialized, call init_pool() first")
+    return _pool
+
+
+async def reconnect(broken: Optional[asyncpg.Pool] = None) -> None:
+    """Replace a broken pool with a fresh one.
+
+    Only ``broken`` is replaced: when several callers fail on the same
+    pool, the first one recreates it and the rest reuse the new pool.
+    """
+    global _pool
+    async with _reconnect_lock:
+        old = _pool
+        if broken is not None and old is not broken:
+            return
+        try:
+            _pool = await _create_pool()
+        except Exception as err:
+            logger.error(f"Database reconnect error: {err}")
+            raise
+        if old is not None:
+            old.terminate()
+        logger.warning("Database pool recreated")
+
+
+async def check_health() -> bool:
+    """Run a trivial query on a pooled connection"""
+    try:
+        async with get_pool().acquire(timeout=5) as conn:
+            await conn.fetchval("SELECT 1")
+        return True
+    except Exception as err:
+        logger.warning(f"Database health check failed: {err}")
+        return False
+
+
+async def _health_loop() -> None:
+    while True:
+        await asyncio.sleep(DB_HEALTH_INTERVAL)
+        pool = _pool
+        if not await check_health():
+            try:
+                await reconnect(pool)
+            except Exception:
+                continue
+
+
+async def _run(method: str, query: str, *args: Any, idempotent: bool) -> Any:
+    pool = get_pool()
+    try:
+        return await getattr(pool, method)(query, *args)
+    except RECONNECT_ERRORS as err:
+        logger.warning(f"Database connection lost ({err}), reconnecting")
+        await reconnect(pool)
+        if not idempotent:
+            # Birinchi urinish commit bo'lgan bo'lishi mumkin - takrorlamaymiz
+            raise
+        return await getattr(get_pool(), method)(query, *args)
+
+
+async def execute(query: str, *args: Any, idempotent: bool = False) -> str:
+    return await _run("execute", query, *args, idempotent=idempotent)
+
+
+async def executemany(query: str, args: Sequence[Sequence[Any]], idempotent: bool = False) -> None:
+    return await _run("executemany", query, args, idempotent=idempotent)
+
+
+async def fetch(query: str, *args: Any, idempotent: bool = True) -> List[asyncpg.Record]:
+    return await _run("fetch", query, *args, idempotent=idempotent)
+
+
+async def fetchrow(query: str, *args: Any, idempotent: bool = True) -> Optional[asyncpg.Record]:
+    return await _run("fetchrow", query, *args, idempotent=idempotent)
+
+
+async def fetchval(query: str, *args: Any, idempotent: bool = True) -> Any:
+    """``idempotent=False`` for writes with RETURNING (INSERT ... RETURNING id, counters)"""
+    return await _run("fetchval", query, *args, idempotent=idempotent)
+
+
+async def execute_chunked(query: str, *args: Any, chunk_size: int = MAINTENANCE_CHUNK_SIZE,
+                          progress: Optional[Progress] = None) -> int:
+    """Repeat a DELETE/UPDATE limited by its last parameter (``chunk_size``) until it affects fewer rows.
+
+    Each run is its own short statement, so locks on huge groups are held
+    only for one chunk at a time. ``progress`` gets the row count of every chunk.
+    """
+    total = 0
+    while True:
+        status = await execute(query, *args, chunk_size, idempotent=True)
+        count = int(status.rsplit(" ", 1)[-1])
+        total += count
+        if progress is not None and count:
+            await progress(count)
+        if count < chunk_size:
+            return total
+
+
+@asynccontextmanager
+async def transaction():
+    """Acquire a connection and run the block inside one transaction"""
+    async with get_pool().acquire() as conn:
+        async with conn.transaction():
+            yield conn
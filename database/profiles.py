@@ -0,0 +1,136 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from contextlib import suppress
+from typing import Dict, Iterable, Optional
+
+from aiogram import Bot
+from aiogram.types import User
+
+from config import PROFILE_CACHE_SIZE, PROFILE_FLUSH_INTERVAL
+from database.pool import execute, fetch
+
+logger = logging.getLogger(__name__)
+
+LAST_SEEN_RESOLUTION = 3600  # last_seen soatiga bir martadan ko'p yozilmaydi
+LOOKUP_CONCURRENCY = 10
+
+
+class UserProfile:
+    __slots__ = ("full_name", "username", "seen_at")
+
+    def __init__(self, full_name: str, username: Optional[str], seen_at: float = 0.0):
+        self.full_name = full_name
+        self.username = username
+        self.seen_at = seen_at
+
+
+class ProfileStore:
+    """User names collected passively from incoming updates.
+
+    Kept in a bounded in-memory LRU and persisted to user_profiles in
+    batches, so leaderboards can be rendered without get_chat_member.
+    """
+
+    def __init__(self, maxsize: int = PROFILE_CACHE_SIZE, flush_interval: float = PROFILE_FLUSH_INTERVAL):
+        self.maxsize = maxsize
+        self.flush_interval = flush_interval
+        self._profiles: OrderedDict = OrderedDict()  # {user_id: UserProfile}
+        self._dirty: Dict[int, UserProfile] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def _store(self, user_id: int, profile: UserProfile) -> None:
+        self._profiles[user_id] = profile
+        self._profiles.move_to_end(user_id)
+        while len(self._profiles) > self.maxsize:
+            self._profiles.popitem(last=False)
+
+    def observe(self, user: User) -> None:
+        """Remember a user seen in an update"""
+        if user.is_bot:
+            return
+        now = time.monotonic()
+        old = self._profiles.get(user.id)
+        if (old is not None and old.full_name == user.full_name and old.username == user.username
+                and now - old.seen_at < LAST_SEEN_RESOLUTION):
+            self._profiles.move_to_end(user.id)
+            return
+        profile = UserProfile(user.full_name, user.username, now)
+        self._store(user.id, profile)
+        self._dirty[user.id] = profile
+
+    async def names(self, bot: Bot, chat_id: int, user_ids: Iterable[int]) -> Dict[int, str]:
+        """Full names for user_ids: memory first, then one DB read, then concurrent API lookups"""
+        user_ids = list(user_ids)
+        result = {uid: self._profiles[uid].full_name for uid in user_ids if uid in self._profiles}
+
+        missing = [uid for uid in user_ids if uid not in result]
+        if missing:
+            try:
+                rows = await fetch(
+                    "SELECT user_id, full_name, username FROM user_profiles WHERE user_id = ANY($1::bigint[])",
+                    missing
+                )
+                for user_id, full_name, username in rows:
+                    self._store(user_id, UserProfile(full_name, username))
+                    result[user_id] = full_name
+            except Exception as err:
+                logger.error(f"Profiles fetch error: {err}")
+
+        missing = [uid for uid in user_ids if uid not in result]
+        if missing:
+            semaphore = asyncio.Semaphore(LOOKUP_CONCURRENCY)
+
+            async def lookup(user_id: int) -> None:
+                async with semaphore:
+                    try:
+                        member = await bot.get_chat_member(chat_id, user_id)
+                        self.observe(member.user)
+                        result[user_id] = member.user.full_name
+                    except Exception as e:
+                        logger.warning(f"Foydalanuvchini olishda xatolik: {e}")
+
+            await asyncio.gather(*(lookup(uid) for uid in missing))
+        return result
+
+    async def flush(self) -> None:
+        dirty, self._dirty = self._dirty, {}
+        if not dirty:
+            return
+        user_ids = list(dirty)
+        try:
+            await execute("""
+                INSERT INTO user_profiles (user_id, full_name, username, last_seen)
+                SELECT user_id, full_name, username, CURRENT_TIMESTAMP
+                FROM unnest($1::bigint[], $2::text[], $3::text[]) AS data(user_id, full_name, username)
+                ON CONFLICT (user_id) DO UPDATE SET
+                    full_name = EXCLUDED.full_name,
+                    username = EXCLUDED.username,
+                    last_seen = EXCLUDED.last_seen
+            """, user_ids, [dirty[u].full_name for u in user_ids], [dirty[u].username for u in user_ids],
+                idempotent=True)
+        except Exception as err:
+            logger.error(f"Profiles flush error: {err}")
+            for user_id, profile in dirty.items():
+                self._dirty.setdefault(user_id, profile)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        await self.flush()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+
+profile_store = ProfileStore()
@@ -0,0 +1,80 @@
+import asyncio
+import logging
+import time
+from contextlib import suppress
+from typing import Optional
+
+from config import STATS_TTL
+from database.pool import fetchrow
+
+logger = logging.getLogger(__name__)
+
+
+class BotStats:
+    __slots__ = ("users_count", "group_count", "admin_count", "total_members", "updated_at")
+
+    def __init__(self, users_count: int, group_count: int, admin_count: int, total_members: int):
+        self.users_count = users_count
+        self.group_count = group_count
+        self.admin_count = admin_count
+        self.total_members = total_members
+        self.updated_at = time.monotonic()
+
+
+class StatsSnapshot:
+    """Admin panel statistics computed by one aggregate query.
+
+    Refreshed in the background every ``ttl`` seconds, so opening the
+    panel normally reads memory only.
+    """
+
+    def __init__(self, ttl: float = STATS_TTL):
+        self.ttl = ttl
+        self._stats: Optional[BotStats] = None
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    async def refresh(self) -> BotStats:
+        row = await fetchrow("""
+            SELECT
+                (SELECT COUNT(*) FROM users) AS users_count,
+                COUNT(*) AS group_count,
+                COUNT(*) FILTER (WHERE bot_status) AS admin_count,
+                COALESCE(SUM(number), 0) AS total_members
+            FROM groups
+        """)
+        self._stats = BotStats(*row)
+        return self._stats
+
+    async def get(self) -> BotStats:
+        stats = self._stats
+        if stats is not None and time.monotonic() - stats.updated_at < self.ttl:
+            return stats
+        async with self._lock:
+            # Boshqa so'rov kutayotgan paytda yangilagan bo'lishi mumkin
+            stats = self._stats
+            if stats is not None and time.monotonic() - stats.updated_at < self.ttl:
+                return stats
+            return await self.refresh()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except Exception as err:
+                logger.error(f"Stats refresh error: {err}")
+            await asyncio.sleep(self.ttl)
+
+
+stats_snapshot = StatsSnapshot()
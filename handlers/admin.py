@@ -1,14 +1,21 @@
 from aiogram import Router, F, Bot
 from aiogram.enums import ChatType
-from aiogram.exceptions import TelegramAPIError, TelegramBadRequest
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import StatesGroup, State
 from aiogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery, ReplyKeyboardMarkup, \
     KeyboardButton, ReplyKeyboardRemove
-from aiogram.filters import Command
+from aiogram.filters import Command, CommandObject, StateFilter
 from typing import List, Optional
 
-from config import ADMIN_ID, cur, conn, bot
+from config import ADMIN_ID, bot
+from database.cache import membership_cache
+from database.comment_buffer import comment_buffer
+from database.stats import stats_snapshot
+from handlers.broadcast import broadcast_engine, FORWARD, COPY
+from handlers.coalescer import request_coalescer
+from handlers.deletion import deletion_queue
+from handlers.ratelimit import outgoing_limiter
+from handlers.refresh import group_refresher
 
 admin_router = Router()
 
@@ -37,24 +44,31 @@ async def admin_stats_handler(callback: CallbackQuery) -> None:
     await callback.answer("Ma'lumotlar yuklanmoqda...")
 
     try:
-        # Foydalanuvchilar soni
-        cur.execute("SELECT COUNT(*) FROM users")
-        users_count = cur.fetchone()[0] if cur.rowcount else 0
-
-        # Guruhlar statistikasi
-        cur.execute("SELECT bot_status, number FROM groups")
-        groups = cur.fetchall()
-
-        group_count = len(groups)
-        total_members = sum(row[1] for row in groups) if groups else 0
-        admin_count = sum(1 for row in groups if row[0]) if groups else 0
+        stats = await stats_snapshot.get()
+        api_stats = request_coalescer.stats()
+        saved = ", ".join(f"{name}: {s['saved']}/{s['requests'] + s['saved']}" for name, s in api_stats.items())
+        limiter = outgoing_limiter.stats()
+        queued = ", ".join(f"{name}: {count}" for name, count in limiter["queued"].items())
+        deletions = deletion_queue.stats()
+        comments = comment_buffer.stats()
+        membership = membership_cache.stats()
+        lookups = membership["hits"] + membership["misses"]
+        hit_rate = membership["hits"] / lookups * 100 if lookups else 0
 
         text = (
             f"📊 <b>Statistika:</b>\n\n"
-            f"👤 Foydalanuvchilar (private): <b>{users_count}</b>\n"
-            f"👥 Guruhlar soni: <b>{group_count}</b>\n"
-            f"🤖 Bot admin bo'lgan guruhlar: <b>{admin_count}</b>\n"
-            f"👨‍👩‍👧‍👦 Jami a'zolar soni: <b>{total_members}</b>"
+            f"👤 Foydalanuvchilar (private): <b>{stats.users_count}</b>\n"
+            f"👥 Guruhlar soni: <b>{stats.group_count}</b>\n"
+            f"🤖 Bot admin bo'lgan guruhlar: <b>{stats.admin_count}</b>\n"
+            f"👨‍👩‍👧‍👦 Jami a'zolar soni: <b>{stats.total_members}</b>\n"
+            f"🔁 Tejalgan API so'rovlar: {saved or '-'}\n"
+            f"⏳ Navbatda: {queued} (RetryAfter: {limiter['retry_after']})\n"
+            f"🗑 O'chirildi: {deletions['deleted']} ({deletions['calls']} so'rov), "
+            f"xato: {deletions['failed']}, kutmoqda: {deletions['pending']}\n"
+            f"💬 Izohlar buferi: {comments['depth']} kutmoqda, {comments['flushes']} yozish "
+            f"(xato: {comments['failed_flushes']}, eng uzoq: {comments['max_flush_seconds']:.2f}s)\n"
+            f"📡 Obuna cache: {hit_rate:.1f}% topildi ({membership['hits']}/{lookups}), "
+            f"hajmi: {membership['size']}"
         )
 
         await callback.message.edit_text(
@@ -70,32 +84,19 @@ async def admin_stats_handler(callback: CallbackQuery) -> None:
 @admin_router.callback_query(F.data == "admin_refresh")
 async def admin_refresh_handler(callback: CallbackQuery, bot: Bot) -> None:
     """Guruhlarni yangilash"""
+    if group_refresher.running:
+        await callback.answer("Yangilash allaqachon ketmoqda...", show_alert=True)
+        return
     await callback.answer("Yangilanish jarayonida...")
-    updated = 0
 
-    try:
-        cur.execute("SELECT group_id FROM groups")
-        groups = cur.fetchall()
-
-        for row in groups:
-            group_id = row[0]
-            try:
-                # A'zolar soni va adminligini tekshirish
-                count = await bot.get_chat_member_count(group_id)
-                me = await bot.get_chat_member(group_id, bot.id)
-                is_admin = me.status in ("administrator", "creator")
-
-                cur.execute("""
-                    UPDATE groups
-                    SET number = %s, bot_status = %s
-                    WHERE group_id = %s
-                """, (count, is_admin, group_id))
-                conn.commit()
-                updated += 1
-            except Exception as e:
-                print(f"Guruh {group_id} yangilashda xatolik: {e}")
-                continue
+    async def progress(done: int, total: int) -> None:
+        await callback.message.edit_text(
+            f"♻️ Yangilanmoqda: {done}/{total}",
+            reply_markup=callback.message.reply_markup
+        )
 
+    try:
+        updated = await group_refresher.refresh_all(bot, progress)
         await callback.message.edit_text(
             f"✅ {updated} ta guruh muvaffaqiyatli yangilandi!",
             reply_markup=callback.message.reply_markup
@@ -106,16 +107,32 @@ async def admin_refresh_handler(callback: CallbackQuery, bot: Bot) -> None:
 
 
 markup = ReplyKeyboardMarkup(resize_keyboard=True, keyboard=[[KeyboardButton(text="🔙Orqaga qaytish")]])
+START_CHUNK_HINT = "\n\nBoshidan emas, N-chunk'dan boshlash uchun avval /dan N yuboring"
+
+
 @admin_router.callback_query(F.data == "send_forward")
 async def admin_stats_handler(call: CallbackQuery, state: FSMContext) -> None:
     await call.message.delete()
     await call.answer()
-    await call.message.answer("Forward yuboriladigan xabarni yuboring", reply_markup=markup)
+    await call.message.answer("Forward yuboriladigan xabarni yuboring" + START_CHUNK_HINT, reply_markup=markup)
     await state.set_state(MsgState.forward_msg)
 
 
+@admin_router.message(StateFilter(MsgState.forward_msg, MsgState.send_msg), Command("dan"),
+                      F.from_user.id.in_(ADMIN_ID))
+async def set_start_chunk(message: Message, command: CommandObject, state: FSMContext):
+    """Optional: start the next broadcast from chunk N (e.g. after a failed one)"""
+    if not command.args or not command.args.strip().isdigit():
+        await message.answer("❗ Chunk raqamini kiriting: /dan 12")
+        return
+    start_chunk = int(command.args.strip())
+    await state.update_data(start_chunk=start_chunk)
+    await message.answer(f"Yuborish {start_chunk}-chunk'dan boshlanadi, endi xabarni yuboring")
+
+
 @admin_router.message(MsgState.forward_msg, F.chat.type == ChatType.PRIVATE, F.from_user.id.in_(ADMIN_ID))
 async def send_forward_to_all(message: Message, state: FSMContext):
+    start_chunk = (await state.get_data()).get("start_chunk", 0)
     await state.clear()
     if message.text=="🔙Orqaga qaytish":
         keyboard = InlineKeyboardMarkup(inline_keyboard=[
@@ -124,35 +141,25 @@ async def send_forward_to_all(message: Message, state: FSMContext):
         [InlineKeyboardButton(text="📨Forward xabar yuborish", callback_data="send_forward")],
         [InlineKeyboardButton(text="📬Oddiy xabar yuborish", callback_data="send_simple")]
     ])
-        await msg.answer("Bosh bo'lim!", reply_markup=keyboard)
+        await message.answer("Bosh bo'lim!", reply_markup=keyboard)
         return
-    cur.execute("SELECT group_id FROM public.groups")
-    rows = cur.fetchall()
-    rows = [row[0] for row in rows]
-    cur.execute("SELECT user_id FROM public.users")
-    rows2 = cur.fetchall()
-    rows2 = [row2[0] for row2 in rows2]
-    num = 0
-    await msg.answer("Yuborish boshlandi", reply_markup=keyboard)
-    for row in rows+rows2:
-        num += await forward_send_msg(bot=bot, from_chat_id=message.chat.id, message_id=message.message_id, chat_id=row)
-
-    await message.bot.send_message(chat_id=message.chat.id,
-                                   text=f"Xabar yuborish yakunlandi, xabaringiz {num} ta odamga yuborildi",
-                                   reply_markup=ReplyKeyboardRemove())
+    await message.answer("Xabar navbatga qo'yildi", reply_markup=ReplyKeyboardRemove())
+    await broadcast_engine.create(bot=message.bot, admin_id=message.chat.id, from_chat_id=message.chat.id,
+                                  message_id=message.message_id, mode=FORWARD, start_chunk=start_chunk)
 
 
 @admin_router.callback_query(F.data == "send_simple")
 async def admin_stats_handler(call: CallbackQuery, state: FSMContext) -> None:
     await call.message.delete()
     await call.answer()
-    await call.message.answer("Yuborilishi kerak bo'lgan xabarni yuboring",
+    await call.message.answer("Yuborilishi kerak bo'lgan xabarni yuboring" + START_CHUNK_HINT,
                          reply_markup=markup)
     await state.set_state(MsgState.send_msg)
 
 
 @admin_router.message(MsgState.send_msg, F.chat.type == ChatType.PRIVATE, F.from_user.id.in_(ADMIN_ID))
 async def send_text_to_all(message: Message, state: FSMContext):
+    start_chunk = (await state.get_data()).get("start_chunk", 0)
     await state.clear()
     if message.text=="🔙Orqaga qaytish":
         keyboard = InlineKeyboardMarkup(inline_keyboard=[
@@ -161,40 +168,8 @@ async def send_text_to_all(message: Message, state: FSMContext):
         [InlineKeyboardButton(text="📨Forward xabar yuborish", callback_data="send_forward")],
         [InlineKeyboardButton(text="📬Oddiy xabar yuborish", callback_data="send_simple")]
     ])
-        await msg.answer("Bosh bo'lim!", reply_markup=keyboard)
+        await message.answer("Bosh bo'lim!", reply_markup=keyboard)
         return
-    cur.execute("SELECT group_id FROM public.groups")
-    rows = cur.fetchall()
-    rows = [row[0] for row in rows]
-    cur.execute("SELECT user_id FROM public.users")
-    rows2 = cur.fetchall()
-    rows2 = [row2[0] for row2 in rows2]
-    num = 0
-    await msg.answer("Yuborish boshlandi", reply_markup=keyboard)
-    for row in rows + rows2:
-        num += await send_message_chats(bot=bot, from_chat_id=message.chat.id, message_id=message.message_id, chat_id=row)
-
-    await message.answer(f"Xabar yuborish yakunlandi, xabaringiz {num} ta odamga yuborildi", reply_markup=ReplyKeyboardRemove())
-
-
-async def forward_send_msg(bot: Bot, chat_id: int, from_chat_id: int, message_id: int) -> int:
-    try:
-        await bot.forward_message(chat_id=chat_id, from_chat_id=from_chat_id, message_id=message_id)
-        return 1
-    except (TelegramAPIError, TelegramBadRequest):
-        pass
-    except Exception as e:
-        print(f"Xatolik (forward): {e}")
-    return 0
-
-
-
-async def send_message_chats(bot: Bot, chat_id: int, from_chat_id: int, message_id: int) -> int:
-    try:
-        await bot.copy_message(chat_id=chat_id, from_chat_id=from_chat_id, message_id=message_id)
-        return 1
-    except (TelegramAPIError, TelegramBadRequest):
-        pass
-    except Exception as e:
-        print(f"Xatolik (copy): {e}")
-    return 0
+    await message.answer("Xabar navbatga qo'yildi", reply_markup=ReplyKeyboardRemove())
+    await broadcast_engine.create(bot=message.bot, admin_id=message.chat.id, from_chat_id=message.chat.id,
+                                  message_id=message.message_id, mode=COPY, start_chunk=start_chunk)
@@ -0,0 +1,242 @@
+import asyncio
+import logging
+import time
+from contextlib import suppress
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+
+from config import BROADCAST_CONCURRENCY, BROADCAST_CHUNK_SIZE
+from database.census import group_census
+from database.pool import execute, fetch, fetchval
+from handlers.updates import shard_of
+
+logger = logging.getLogger(__name__)
+
+FORWARD = "forward"
+COPY = "copy"
+
+GROUPS = "groups"
+USERS = "users"
+STAGES = (GROUPS, USERS)
+RECIPIENT_SOURCES = {  # stage: (table, id column, active condition)
+    GROUPS: ("groups", "group_id", "active"),
+    USERS: ("users", "user_id", "status"),
+}
+
+PROGRESS_INTERVAL = 5  # soniya
+
+
+class BroadcastJob:
+    __slots__ = ("id", "admin_id", "from_chat_id", "message_id", "mode",
+                 "stage", "last_id", "sent", "failed", "progress_message_id")
+
+    def __init__(self, id: int, admin_id: int, from_chat_id: int, message_id: int, mode: str,
+                 stage: str = GROUPS, last_id: Optional[int] = None, sent: int = 0, failed: int = 0,
+                 progress_message_id: Optional[int] = None):
+        self.id = id
+        self.admin_id = admin_id
+        self.from_chat_id = from_chat_id
+        self.message_id = message_id
+        self.mode = mode
+        self.stage = stage
+        self.last_id = last_id
+        self.sent = sent
+        self.failed = failed
+        self.progress_message_id = progress_message_id
+
+
+class BroadcastEngine:
+    """Rate-limited, resumable broadcast to all groups and private users.
+
+    Recipients are streamed from Postgres in id order with keyset
+    pagination, one chunk at a time. After each chunk the job's position
+    is saved in broadcast_jobs, so a restarted bot continues from the last
+    finished chunk.
+    """
+
+    def __init__(self, concurrency: int = BROADCAST_CONCURRENCY, chunk_size: int = BROADCAST_CHUNK_SIZE):
+        self.concurrency = concurrency
+        self.chunk_size = chunk_size
+        self._tasks: Dict[int, asyncio.Task] = {}
+
+    async def create(self, bot: Bot, admin_id: int, from_chat_id: int, message_id: int, mode: str,
+                     start_chunk: int = 0) -> int:
+        """Start a broadcast job, optionally skipping the first ``start_chunk`` chunks"""
+        stage, last_id = await self._seek(start_chunk)
+        progress = await bot.send_message(admin_id, "Yuborish boshlandi")
+        job_id = await fetchval("""
+            INSERT INTO broadcast_jobs (admin_id, from_chat_id, message_id, mode, stage, last_id, progress_message_id)
+            VALUES ($1, $2, $3, $4, $5, $6, $7)
+            RETURNING id
+        """, admin_id, from_chat_id, message_id, mode, stage, last_id, progress.message_id, idempotent=False)
+        self._start(bot, BroadcastJob(job_id, admin_id, from_chat_id, message_id, mode, stage, last_id,
+                                      progress_message_id=progress.message_id))
+        return job_id
+
+    async def resume_all(self, bot: Bot, shard_index: int = 0, shard_count: int = 1) -> None:
+        """Continue broadcasts interrupted by a restart (those started from this worker's admin chats)"""
+        rows = await fetch("""
+            SELECT id, admin_id, from_chat_id, message_id, mode, stage, last_id, sent, failed, progress_message_id
+            FROM broadcast_jobs WHERE status = 'running'
+        """)
+        for row in rows:
+            if shard_of(row[1], shard_count) != shard_index:
+                continue
+            self._start(bot, BroadcastJob(*row))
+
+    def _start(self, bot: Bot, job: BroadcastJob) -> None:
+        task = asyncio.create_task(self._run(bot, job))
+        self._tasks[job.id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job.id, None))
+
+    async def stop(self) -> None:
+        # Holat har bir chunk'dan keyin saqlangan, qayta ishga tushganda davom etadi
+        for task in list(self._tasks.values()):
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+
+    async def _fetch_chunk(self, stage: str, last_id: Optional[int]) -> List[int]:
+        """Next chunk of recipients after ``last_id`` (keyset pagination)"""
+        table, column, active = RECIPIENT_SOURCES[stage]
+        rows = await fetch(f"""
+            SELECT {column} FROM {table}
+            WHERE {active} AND ($1::bigint IS NULL OR {column} > $1)
+            ORDER BY {column}
+            LIMIT $2
+        """, last_id, self.chunk_size)
+        return [row[0] for row in rows]
+
+    async def _chunks(self, stage: str, last_id: Optional[int]) -> AsyncIterator[List[int]]:
+        """Stream recipient chunks, fetching the next one while the current is being sent"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+
+        async def produce() -> None:
+            cursor = last_id
+            try:
+                while True:
+                    chunk = await self._fetch_chunk(stage, cursor)
+                    await queue.put(chunk)
+                    if len(chunk) < self.chunk_size:
+                        return
+                    cursor = chunk[-1]
+            except Exception as e:
+                await queue.put(e)
+
+        producer = asyncio.create_task(produce())
+        try:
+            while True:
+                chunk = await queue.get()
+                if isinstance(chunk, Exception):
+                    raise chunk
+                if chunk:
+                    yield chunk
+                if len(chunk) < self.chunk_size:
+                    return
+        finally:
+            producer.cancel()
+
+    async def _seek(self, start_chunk: int) -> Tuple[str, Optional[int]]:
+        """Translate a chunk offset into a (stage, last_id) position"""
+        for stage in STAGES:
+            if start_chunk <= 0:
+                return stage, None
+            table, column, active = RECIPIENT_SOURCES[stage]
+            total = await fetchval(f"SELECT COUNT(*) FROM {table} WHERE {active}")
+            skip = start_chunk * self.chunk_size
+            if skip < total:
+                return stage, await fetchval(f"""
+                    SELECT {column} FROM {table} WHERE {active}
+                    ORDER BY {column} OFFSET $1 LIMIT 1
+                """, skip - 1)
+            start_chunk -= -(-total // self.chunk_size)
+        return STAGES[-1], await fetchval("SELECT MAX(user_id) FROM users")
+
+    async def _run(self, bot: Bot, job: BroadcastJob) -> None:
+        semaphore = asyncio.Semaphore(self.concurrency)
+        last_report = time.monotonic()
+
+        async def send(chat_id: int, stage: str) -> None:
+            async with semaphore:
+                if await self._send_one(bot, job, chat_id, stage):
+                    job.sent += 1
+                else:
+                    job.failed += 1
+
+        try:
+            for stage in STAGES[STAGES.index(job.stage):]:
+                if stage != job.stage:
+                    job.stage, job.last_id = stage, None
+                async for chunk in self._chunks(stage, job.last_id):
+                    await asyncio.gather(*(send(chat_id, stage) for chat_id in chunk))
+                    job.last_id = chunk[-1]
+                    await self._save(job)
+                    if time.monotonic() - last_report >= PROGRESS_INTERVAL:
+                        last_report = time.monotonic()
+                        await self._report(bot, job, f"📤 Yuborilmoqda... ✅ {job.sent} ta, ❌ {job.failed} ta")
+            await self._save(job, status="done")
+            await self._report(bot, job, f"✅ Yuborish yakunlandi: {job.sent} ta, ❌ {job.failed} ta")
+            await bot.send_message(
+                job.admin_id, f"Xabar yuborish yakunlandi, xabaringiz {job.sent} ta odamga yuborildi"
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Broadcast {job.id} xatolik: {e}")
+            text = f"❌ Yuborish xatolik bilan to'xtadi: ✅ {job.sent} ta, ❌ {job.failed} ta"
+            with suppress(Exception):
+                await self._save(job, status="failed")
+            await self._report(bot, job, text)
+            with suppress(Exception):
+                await bot.send_message(job.admin_id, text)
+
+    async def _send_one(self, bot: Bot, job: BroadcastJob, chat_id: int, stage: str) -> bool:
+        # Tezlik va RetryAfter'dan keyingi qayta urinishlar outgoing_limiter'da
+        try:
+            if job.mode == FORWARD:
+                await bot.forward_message(chat_id=chat_id, from_chat_id=job.from_chat_id, message_id=job.message_id)
+            else:
+                await bot.copy_message(chat_id=chat_id, from_chat_id=job.from_chat_id, message_id=job.message_id)
+            return True
+        except TelegramForbiddenError:
+            await self._deactivate(chat_id, stage)
+            return False
+        except TelegramBadRequest as e:
+            if "chat not found" in str(e) or "deactivated" in str(e):
+                await self._deactivate(chat_id, stage)
+            return False
+        except Exception as e:
+            print(f"Xatolik ({job.mode}): {e}")
+            return False
+
+    @staticmethod
+    async def _deactivate(chat_id: int, stage: str) -> None:
+        """Mark blocked/removed recipients so later broadcasts skip them"""
+        try:
+            if stage == GROUPS:
+                await execute("UPDATE groups SET active = FALSE WHERE group_id = $1", chat_id, idempotent=True)
+            else:
+                await execute("UPDATE users SET status = FALSE WHERE user_id = $1", chat_id, idempotent=True)
+                group_census.forget_user(chat_id)
+        except Exception as err:
+            logger.error(f"Recipient status update error: {err}")
+
+    @staticmethod
+    async def _save(job: BroadcastJob, status: str = "running") -> None:
+        await execute("""
+            UPDATE broadcast_jobs
+            SET stage = $2, last_id = $3, sent = $4, failed = $5, status = $6, updated_at = CURRENT_TIMESTAMP
+            WHERE id = $1
+        """, job.id, job.stage, job.last_id, job.sent, job.failed, status, idempotent=True)
+
+    @staticmethod
+    async def _report(bot: Bot, job: BroadcastJob, text: str) -> None:
+        if job.progress_message_id is None:
+            return
+        with suppress(Exception):
+            await bot.edit_message_text(text, chat_id=job.admin_id, message_id=job.progress_message_id)
+
+
+broadcast_engine = BroadcastEngine()
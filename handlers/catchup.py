@@ -0,0 +1,68 @@
+import logging
+import time
+from typing import List
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+
+from config import CATCH_UP_CONCURRENCY
+from database.census import group_census
+from handlers.updates import ChatSerializer, event_chat_id
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 100  # getUpdates limit maksimumi
+MAX_PENDING = BATCH_SIZE * 5
+
+
+def collapse(updates: List[Update]) -> List[Update]:
+    """Drop updates made redundant by a later one in the same batch.
+
+    Only the last my_chat_member of a chat matters: it carries the bot's
+    final status there.
+    """
+    last_status = {}
+    for index, update in enumerate(updates):
+        if update.my_chat_member is not None:
+            last_status[update.my_chat_member.chat.id] = index
+    return [
+        update for index, update in enumerate(updates)
+        if update.my_chat_member is None or last_status[update.my_chat_member.chat.id] == index
+    ]
+
+
+async def catch_up(bot: Bot, dp: Dispatcher, concurrency: int = CATCH_UP_CONCURRENCY) -> int:
+    """Handle updates that piled up while the bot was offline, then return.
+
+    Updates are fetched in batches of 100 and handled in order per chat,
+    with ``concurrency`` updates in flight overall. Census refreshes are
+    deferred and done once per group after the backlog is drained.
+    """
+    allowed_updates = dp.resolve_used_update_types()
+    serializer = ChatSerializer(lambda update: dp.feed_update(bot, update), concurrency)
+    started = time.monotonic()
+    offset, fetched, skipped = None, 0, 0
+    group_census.pause()
+    try:
+        while True:
+            # Keyingi offset bilan so'rash oldingi update'larni tasdiqlaydi
+            updates = await bot.get_updates(offset=offset, limit=BATCH_SIZE, timeout=0, allowed_updates=allowed_updates)
+            if not updates:
+                break
+            offset = updates[-1].update_id + 1
+            fetched += len(updates)
+            batch = collapse(updates)
+            skipped += len(updates) - len(batch)
+            for update in batch:
+                serializer.submit(event_chat_id(update), update)
+            await serializer.wait_pending(MAX_PENDING)
+        await serializer.join()
+    finally:
+        group_census.resume(bot)
+
+    if fetched:
+        logger.info(
+            f"Catch-up: {fetched} update ({skipped} collapsed, {serializer.failed} failed) "
+            f"in {time.monotonic() - started:.1f}s"
+        )
+    return fetched
@@ -0,0 +1,96 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Tuple
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods import (
+    BanChatMember, GetChat, GetChatAdministrators, GetChatMember, GetChatMemberCount, PromoteChatMember,
+    RestrictChatMember, TelegramMethod, UnbanChatMember
+)
+
+from config import REQUEST_MEMO_TTL
+from database.cache import SingleFlight
+
+# Bir xil parametrli parallel chaqiruvlari bitta so'rovga birlashtiriladigan metodlar
+COALESCED_METHODS = (GetChatMember, GetChat, GetChatMemberCount, GetChatAdministrators)
+# A'zo holatini o'zgartiradigan metodlar - shu a'zo uchun eslab qolingan natija o'chiriladi
+MEMBER_WRITES = (RestrictChatMember, BanChatMember, UnbanChatMember, PromoteChatMember)
+MEMO_MAXSIZE = 10000
+
+
+class MethodStats:
+    __slots__ = ("requests", "coalesced", "memo_hits")
+
+    def __init__(self):
+        self.requests = 0
+        self.coalesced = 0
+        self.memo_hits = 0
+
+
+class RequestCoalescer(BaseRequestMiddleware):
+    """Single-flight for read-only Bot API calls.
+
+    Identical in-flight calls (same method, chat_id and user_id) share one
+    HTTP request. With ``ttl`` > 0 successful results are also reused for
+    that many seconds.
+    """
+
+    def __init__(self, ttl: float = REQUEST_MEMO_TTL, maxsize: int = MEMO_MAXSIZE):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._inflight = SingleFlight()
+        self._memo: OrderedDict = OrderedDict()  # {key: (expires_at, result)}
+        self._stats: Dict[str, MethodStats] = {}
+
+    @staticmethod
+    def _key(bot: Bot, method: TelegramMethod) -> Tuple:
+        return bot.id, method.__api_method__, method.chat_id, getattr(method, "user_id", None)
+
+    def _remember(self, key: Hashable, result: Any) -> None:
+        now = time.monotonic()
+        memo = self._memo
+        # Muddat hamma uchun bir xil, shuning uchun eng eskilari boshida turadi
+        while memo and (len(memo) >= self.maxsize or next(iter(memo.values()))[0] <= now):
+            memo.popitem(last=False)
+        memo[key] = (now + self.ttl, result)
+
+    async def __call__(self, make_request: NextRequestMiddlewareType, bot: Bot, method: TelegramMethod) -> Any:
+        if isinstance(method, MEMBER_WRITES):
+            self._memo.pop((bot.id, GetChatMember.__api_method__, method.chat_id, method.user_id), None)
+            return await make_request(bot, method)
+        if not isinstance(method, COALESCED_METHODS):
+            return await make_request(bot, method)
+
+        key = self._key(bot, method)
+        stats = self._stats.get(method.__api_method__)
+        if stats is None:
+            stats = self._stats[method.__api_method__] = MethodStats()
+
+        if self.ttl > 0:
+            entry = self._memo.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                stats.memo_hits += 1
+                return entry[1]
+
+        if key in self._inflight:
+            stats.coalesced += 1
+
+        async def load() -> Any:
+            stats.requests += 1
+            result = await make_request(bot, method)
+            if self.ttl > 0:
+                self._remember(key, result)
+            return result
+
+        return await self._inflight.run(key, load)
+
+    def stats(self) -> dict:
+        return {
+            name: {"requests": s.requests, "coalesced": s.coalesced, "memo_hits": s.memo_hits,
+                   "saved": s.coalesced + s.memo_hits}
+            for name, s in self._stats.items()
+        }
+
+
+request_coalescer = RequestCoalescer()
@@ -0,0 +1,97 @@
+import asyncio
+import logging
+from typing import Dict, List, Set
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest
+
+from config import DELETE_WINDOW
+
+logger = logging.getLogger(__name__)
+
+BATCH_LIMIT = 100  # deleteMessages bir chaqiruvda ko'pi bilan 100 ta xabar
+
+
+class DeletionQueue:
+    """Message deletions gathered per chat and sent with deleteMessages.
+
+    Ids of a chat are collected for ``window`` seconds (or until 100 are
+    pending) and deleted in one call; if the bulk call is rejected the
+    messages are deleted one by one.
+    """
+
+    def __init__(self, window: float = DELETE_WINDOW):
+        self.window = window
+        self._pending: Dict[int, List[int]] = {}
+        self._timers: Dict[int, asyncio.TimerHandle] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self._bot = None
+        self.queued = 0
+        self.deleted = 0
+        self.failed = 0
+        self.calls = 0
+
+    def add(self, bot: Bot, chat_id: int, message_id: int) -> None:
+        self._bot = bot
+        self.queued += 1
+        message_ids = self._pending.setdefault(chat_id, [])
+        message_ids.append(message_id)
+        if len(message_ids) >= BATCH_LIMIT:
+            self._send(chat_id)
+        elif chat_id not in self._timers:
+            self._timers[chat_id] = asyncio.get_running_loop().call_later(self.window, self._send, chat_id)
+
+    def _send(self, chat_id: int) -> None:
+        timer = self._timers.pop(chat_id, None)
+        if timer is not None:
+            timer.cancel()
+        message_ids = self._pending.pop(chat_id, None)
+        if message_ids:
+            task = asyncio.create_task(self.delete(self._bot, chat_id, message_ids))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def delete(self, bot: Bot, chat_id: int, message_ids: List[int]) -> None:
+        """Delete ``message_ids`` right away in chunks of 100"""
+        for start in range(0, len(message_ids), BATCH_LIMIT):
+            chunk = message_ids[start:start + BATCH_LIMIT]
+            self.calls += 1
+            try:
+                if len(chunk) == 1:
+                    await bot.delete_message(chat_id, chunk[0])
+                else:
+                    await bot.delete_messages(chat_id, chunk)
+                self.deleted += len(chunk)
+            except TelegramBadRequest as e:
+                if len(chunk) == 1:
+                    self.failed += 1
+                    logger.warning(f"Xabarni o'chirishda xatolik: {e}")
+                else:
+                    await asyncio.gather(*(self._delete_one(bot, chat_id, message_id) for message_id in chunk))
+            except Exception as e:
+                self.failed += len(chunk)
+                logger.warning(f"Xabarlarni o'chirishda xatolik ({chat_id}): {e}")
+
+    async def _delete_one(self, bot: Bot, chat_id: int, message_id: int) -> None:
+        self.calls += 1
+        try:
+            await bot.delete_message(chat_id, message_id)
+            self.deleted += 1
+        except Exception as e:
+            self.failed += 1
+            logger.warning(f"Xabarni o'chirishda xatolik: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "pending": sum(len(ids) for ids in self._pending.values()),
+            "queued": self.queued, "deleted": self.deleted, "failed": self.failed, "calls": self.calls,
+        }
+
+    async def stop(self) -> None:
+        for chat_id in list(self._pending):
+            self._send(chat_id)
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+deletion_queue = DeletionQueue()
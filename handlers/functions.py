@@ -1,6 +1,10 @@
+from typing import Optional
+
 from aiogram.types import Message
 
-from config import cur, conn
+from database.cache import get_admins, leaderboard_cache, TOP_COMMENTERS
+from database.comment_buffer import comment_buffer
+from database.pool import transaction, execute_chunked, fetch, Progress
 
 
 async def classify_admin(msg: Message):
@@ -11,88 +15,61 @@ async def classify_admin(msg: Message):
         return True
 
     elif msg.from_user and msg.from_user.is_bot:
+        # get_chat_administrators botlarni qaytarmaydi, shuning uchun alohida so'raymiz
         member = await msg.bot.get_chat_member(msg.chat.id, msg.from_user.id)
         if member.status in ["administrator", "creator"]:
             return True
 
     elif msg.from_user:
-        member = await msg.bot.get_chat_member(msg.chat.id, msg.from_user.id)
-        if member.status in ["administrator", "creator"]:
+        # Adminlar ro'yxati cache'dan olinadi
+        admins = await get_admins(msg.chat.id, msg.bot)
+        if msg.from_user.id in admins:
             return True
     return False
 
 
 async def increment_user_comment(group_id: int, user_id: int, message_id: int, message_text: str = "") -> None:
-    """Insert or update comment count and total length for user"""
+    """Buffer comment count and length for user, written in batches by comment_buffer"""
     text_length = len(message_text.strip()) if message_text else 0
-
-    try:
-        cur.execute("""
-            INSERT INTO user_comments (group_id, user_id, count, lengths)
-            VALUES (%s, %s, 1, %s)
-            ON CONFLICT (group_id, user_id)
-            DO UPDATE SET 
-                count = user_comments.count + 1,
-                lengths = user_comments.lengths + EXCLUDED.lengths
-        """, (group_id, user_id, text_length))
-        conn.commit()
-
-        cur.execute("""
-            INSERT INTO comment_messages (group_id, user_id, message_id, length)
-            VALUES (%s, %s, %s, %s)
-            ON CONFLICT (group_id, message_id) DO NOTHING
-            """, (group_id, user_id, message_id, text_length))
-        conn.commit()
-
-        cur.execute("""
-            INSERT INTO all_comment (group_id, message_id)
-            VALUES (%s, %s)
-            ON CONFLICT (group_id, message_id) DO NOTHING
-            """, (group_id, message_id))
-        conn.commit()
-    except Exception as err:
-        print(f"increment_user_comment error: {err}")
-        conn.rollback()
-        raise
+    comment_buffer.add(group_id, user_id, message_id, text_length)
 
 
-async def delete_group_comments(group_id: int) -> None:
-    """Delete all comment counts for a specific group"""
+async def delete_group_comments(group_id: int, progress: Optional[Progress] = None) -> int:
+    """Delete all comment counts for a specific group in chunks; returns the number of deleted rows"""
+    await comment_buffer.discard(group_id)
     try:
-        cur.execute(
-            "DELETE FROM user_comments WHERE group_id = %s",
-            (group_id,)
-        )
-        conn.commit()
-
-        cur.execute(
-            "DELETE FROM comment_messages WHERE group_id = %s",
-            (group_id,)
-        )
-        conn.commit()
+        total = await execute_chunked("""
+            DELETE FROM comment_messages WHERE group_id = $1 AND message_id IN (
+                SELECT message_id FROM comment_messages WHERE group_id = $1 LIMIT $2)
+        """, group_id, progress=progress)
+        total += await execute_chunked("""
+            DELETE FROM user_comments WHERE group_id = $1 AND user_id IN (
+                SELECT user_id FROM user_comments WHERE group_id = $1 LIMIT $2)
+        """, group_id, progress=progress)
+        leaderboard_cache.invalidate(TOP_COMMENTERS, group_id)
+        return total
     except Exception as err:
         print(f"delete_group_comments error: {err}")
-        conn.rollback()
         raise
 
 
 async def delete_one_comment(group_id: int, user_id: int) -> None:
     """Delete one comment counts for a specific group"""
+    await comment_buffer.discard(group_id, user_id)
     try:
-        cur.execute(
-            "DELETE FROM user_comments WHERE group_id = %s and user_id = %s",
-            (group_id, user_id,)
-        )
-        conn.commit()
-
-        cur.execute(
-            "DELETE FROM comment_messages WHERE group_id = %s and user_id = %s",
-            (group_id, user_id,)
-        )
-        conn.commit()
+        async with transaction() as conn:
+            await conn.execute(
+                "DELETE FROM user_comments WHERE group_id = $1 and user_id = $2",
+                group_id, user_id
+            )
+
+            await conn.execute(
+                "DELETE FROM comment_messages WHERE group_id = $1 and user_id = $2",
+                group_id, user_id
+            )
+        leaderboard_cache.invalidate(TOP_COMMENTERS, group_id)
     except Exception as err:
         print(f"delete_group_comments error: {err}")
-        conn.rollback()
         raise
 
 
@@ -102,15 +79,14 @@ async def get_top_commenters(group_id: int, limit: int = 20):
     Returns: List of tuples (user_id, count, average_length)
     """
     try:
-        cur.execute("""
+        return await fetch("""
             SELECT user_id, count, 
                    CASE WHEN count > 0 THEN ROUND(lengths::decimal / count, 1) ELSE 0 END as avg_length
             FROM user_comments
-            WHERE group_id = %s
+            WHERE group_id = $1
             ORDER BY count DESC
-            LIMIT %s
-        """, (group_id, limit))
-        return cur.fetchall()
+            LIMIT $2
+        """, group_id, limit)
     except Exception as err:
         print(f"get_top_commenters error: {err}")
-        return []
\ No newline at end of file
+        return []
@@ -1,29 +1,44 @@
-import asyncio
 import re
 import logging
-from datetime import timedelta
-from typing import List, Optional, Tuple
+from datetime import datetime, timedelta, timezone
 
 from aiogram import Router, Bot, F
-from aiogram.enums import ChatType, MessageEntityType
+from aiogram.enums import ChatType
+from aiogram.dispatcher.event.bases import SkipHandler
 from aiogram.filters import BaseFilter, Command, CommandObject
 from aiogram.types import ChatMemberUpdated
-from aiogram.filters import ChatMemberUpdatedFilter
-from aiogram.types import Message, ChatPermissions, User, ChatMember
+from aiogram.types import Message, ChatPermissions
 
-from config import cur
-from database.cache import get_admins
+from database.policy import group_policies
+from database.profiles import profile_store
+from database.pool import fetchval
+from database.cache import (
+    update_admin, invalidate_admins, ADMIN_STATUSES, leaderboard_cache, TOP_ADDERS, TOP_COMMENTERS
+)
+from database.census import group_census
+from database.channel_info import channel_info_cache
+from database.comment_buffer import comment_buffer
 from database.frombase import (
-    add_member, add_channel, remove_channel, remove_members_by_user,
+    add_members, add_channel, remove_channel, remove_members_by_user,
     remove_all_members, get_total_by_user, get_top_adders, get_required_channels,
-    is_user_subscribed_all_channels, check_user_requirement, update_user_status
+    is_user_subscribed_all_channels, check_user_requirement, update_user_status, set_required_count
 )
+from handlers.deletion import deletion_queue
+from handlers.links import link_detector, domain_blocklists
+from handlers.maintenance import group_maintenance
+from handlers.scheduler import job_scheduler, DELETE_MESSAGE, RESTORE_PERMISSIONS
 from handlers.functions import classify_admin, increment_user_comment, get_top_commenters, delete_group_comments, \
     delete_one_comment
 
 logger = logging.getLogger(__name__)
 group_router = Router()
 
+RESTRICT_SECONDS = 10
+RESTORED_PERMISSIONS = (
+    "can_send_messages", "can_send_media_messages", "can_send_polls", "can_send_other_messages",
+    "can_add_web_page_previews", "can_change_info", "can_invite_users", "can_pin_messages",
+)
+
 
 # === FILTERS ===
 class IsGroupMessage(BaseFilter):
@@ -34,33 +49,7 @@ class IsGroupMessage(BaseFilter):
 class HasLink(BaseFilter):
 
     async def __call__(self, message: Message) -> bool:
-        entities = message.entities or []
-        caption_entities = message.caption_entities or []
-
-        # 1. Entitylar ichida link yoki mention borligini tekshirish
-        for entity in entities + caption_entities:
-            if entity.type in {
-                MessageEntityType.URL,
-                MessageEntityType.TEXT_LINK,
-                MessageEntityType.MENTION
-            }:
-                # Bot useri bo‘lsa, o'tkazib yuboramiz
-                if entity.type == MessageEntityType.MENTION:
-                    mentioned_text = message.text[entity.offset: entity.offset + entity.length]
-                    if mentioned_text.lower() == f"@uzguruh_bot":
-                        continue  # Skip own bot mention
-                return True
-
-        # 2. Text va caption ichida @user borligini regex orqali tekshiramiz
-        text_sources = [message.text, message.caption]
-        for text in text_sources:
-            if text:
-                matches = re.findall(r'@[\w\d_]{5,}', text)
-                for mention in matches:
-                    if mention.lower() != f"@uzguruh_bot":
-                        return True  # Boshqa userlar
-        return False
-
+        return link_detector.has_link(message, domain_blocklists.matcher(message.chat.id))
 
 
 class IsJoinOrLeft(BaseFilter):
@@ -74,18 +63,21 @@ async def handle_group_join_left(message: Message, bot: Bot) -> None:
     print("galdiii")
     """Handle new members joining or leaving the group"""
     if message.new_chat_members:
-        for new_member in message.new_chat_members:
-            if message.from_user.id != new_member.id:
-                await add_member(message, new_member.id)
+        member_ids = [m.id for m in message.new_chat_members if m.id != message.from_user.id]
+        if member_ids:
+            await add_members(message.chat.id, message.from_user.id, member_ids)
 
-    try:
-        await message.delete()
-    except Exception as e:
-        logger.warning(f"Xabarni o'chirishda xatolik: {e}")
+    # Reyd paytida xizmat xabarlari yig'ilib, bittada o'chiriladi
+    deletion_queue.add(bot, message.chat.id, message.message_id)
 
 
 @group_router.chat_member()
 async def handle_chat_member_update(event: ChatMemberUpdated, bot: Bot):
+    # Admin qilish / adminlikdan olish - cache'ni yangilaymiz
+    old_status, new_status = event.old_chat_member.status, event.new_chat_member.status
+    if old_status != new_status and (old_status in ADMIN_STATUSES or new_status in ADMIN_STATUSES):
+        update_admin(event.chat.id, event.new_chat_member.user.id, new_status)
+
     # Bot o'zgarishi
     if event.new_chat_member.user.id == bot.id:
         return
@@ -95,21 +87,27 @@ async def handle_chat_member_update(event: ChatMemberUpdated, bot: Bot):
         if event.from_user.id != event.new_chat_member.user.id:
             # Boshqa user uni qo‘shgan bo‘lsa
             print(f"{event.from_user.full_name} ➕ {event.new_chat_member.user.full_name}")
-            await add_member(event, event.new_chat_member.user.id)
+            await add_members(event.chat.id, event.from_user.id, [event.new_chat_member.user.id])
             # Xabarni topib o‘chirishga harakat qilamiz (oxirgi 1-2 ta xabarni tekshirib)
 
 
+@group_router.my_chat_member()
+async def handle_my_chat_member_update(event: ChatMemberUpdated) -> None:
+    """Keep group census in sync when the bot is promoted, demoted or removed"""
+    if event.chat.type in {ChatType.GROUP, ChatType.SUPERGROUP}:
+        group_census.observe_bot_status(event.chat.id, event.new_chat_member.status)
+        # Bot admin bo'lmaganda chat_member update'lari kelmaydi - saqlangan ro'yxatga ishonib bo'lmaydi
+        invalidate_admins(event.chat.id)
+
+
 # === HAVOLALARNI O'CHIRISH ===
 @group_router.message(IsGroupMessage(), HasLink())
-async def handle_links(message: Message) -> None:
+async def handle_links(message: Message, bot: Bot) -> None:
     """Delete messages containing links from non-admins"""
     if await classify_admin(message):
-        return
+        raise SkipHandler()  # adminlar xabari keyingi handlerlarga (/kanal @username, /blok ...) o'tadi
 
-    try:
-        await message.delete()
-    except Exception as e:
-        logger.warning(f"Xabarni o'chirishda xatolik: {e}")
+    deletion_queue.add(bot, message.chat.id, message.message_id)
 
     user_id = message.from_user.id
     name = message.from_user.full_name
@@ -133,7 +131,12 @@ async def handle_get_channel(message: Message) -> None:
 async def handle_reset(message: Message) -> None:
     """Reset user statuses in group"""
     if await classify_admin(message):
-        await update_user_status(message)
+        group_id = message.chat.id
+        await group_maintenance.start(
+            message, "Statuslar qayta hisoblanmoqda",
+            lambda progress: update_user_status(group_id, progress),
+            "✅ Statuslar qayta hisoblandi"
+        )
 
     try:
         await message.delete()
@@ -169,6 +172,9 @@ async def handle_info(message: Message) -> None:
         "🔹 <b>/kanallar</b> – Ulangan kanallar ro‘yxati\n"
         "🔹 <b>/kanal @username</b> – Yangi kanalni ulash\n"
         "🔹 <b>/kanald @username</b> – Kanalni ro‘yxatdan olib tashlash\n"
+        "🔹 <b>/blok domen</b> – Domenni taqiqlash\n"
+        "🔹 <b>/blokd domen</b> – Domenni taqiqdan chiqarish\n"
+        "🔹 <b>/bloklar</b> – Taqiqlangan domenlar ro‘yxati\n"
         "🔹 <b>/cleanuser</b> – Foydalanuvchining qo‘shganlarini tozalash\n"
         "🔹 <b>/cleangroup</b> – Guruhdagi barcha qo‘shilgan foydalanuvchilarni tozalash\n"
         "🔹 <b>/izohlar</b> – Guruhdagi top 20ta izohchilar ro'yxati\n"
@@ -188,12 +194,7 @@ async def disable_required_add_count(message: Message) -> None:
             logger.warning(f"Xabarni o'chirishda xatolik: {e}")
         return
 
-    group_id = message.chat.id
-    cur.execute("""
-        INSERT INTO group_requirement (group_id, required_count)
-        VALUES (%s, 0)
-        ON CONFLICT (group_id) DO UPDATE SET required_count = 0
-    """, (group_id,))
+    await set_required_count(message.chat.id, 0)
 
     await message.reply("❌ A'zo qo'shish talabi bekor qilindi.")
 
@@ -214,13 +215,7 @@ async def set_required_add_count(message: Message) -> None:
         return
 
     required_count = int(match.group(1))
-    group_id = message.chat.id
-
-    cur.execute("""
-        INSERT INTO group_requirement (group_id, required_count)
-        VALUES (%s, %s)
-        ON CONFLICT (group_id) DO UPDATE SET required_count = EXCLUDED.required_count
-    """, (group_id, required_count))
+    await set_required_count(message.chat.id, required_count)
 
     await message.reply(f"✅ Endi har bir foydalanuvchi {required_count} ta a'zo qo'shishi shart.")
 
@@ -244,8 +239,7 @@ async def handle_get_channel(message: Message, bot: Bot) -> None:
     usernames = []
     for channel_id in channels:
         try:
-            chat = await bot.get_chat(channel_id)
-            usernames.append(f"@{chat.username}" if chat.username else chat.title)
+            usernames.append(await channel_info_cache.get_name(bot, channel_id))
         except Exception as e:
             logger.warning(f"Kanal ma'lumotlarini olishda xatolik: {e}")
             usernames.append(str(channel_id))
@@ -275,6 +269,7 @@ async def handle_add_channel(message: Message, command: CommandObject, bot: Bot)
     try:
         channel = await bot.get_chat(channel_username)
         await add_channel(message.chat.id, channel.id)
+        await channel_info_cache.remember(channel)
         await message.reply(f"✅ {channel_username} bazaga qo'shildi.")
     except Exception as e:
         logger.warning(f"Kanalni olishda xatolik: {e}")
@@ -309,6 +304,67 @@ async def handle_remove_channel(message: Message, command: CommandObject, bot: B
         await message.reply("❌ Kanal topilmadi yoki bot kanalga kira olmayapti.")
 
 
+# === TAQIQLANGAN DOMENLAR ===
+@group_router.message(Command("blok"), IsGroupMessage())
+async def handle_block_domain(message: Message, command: CommandObject) -> None:
+    """Add domain to group's blocklist"""
+    if not await classify_admin(message):
+        try:
+            await message.delete()
+        except Exception as e:
+            logger.warning(f"Xabarni o'chirishda xatolik: {e}")
+        return
+
+    if not command.args:
+        await message.reply("❗ Domenni kiriting: /blok example.com")
+        return
+
+    try:
+        domain = await domain_blocklists.add(message.chat.id, command.args.strip())
+    except ValueError:
+        await message.reply("❗ Domenni kiriting: /blok example.com")
+        return
+    await message.reply(f"🚫 {domain} taqiqlangan domenlarga qo'shildi.")
+
+
+@group_router.message(Command("blokd"), IsGroupMessage())
+async def handle_unblock_domain(message: Message, command: CommandObject) -> None:
+    """Remove domain from group's blocklist"""
+    if not await classify_admin(message):
+        try:
+            await message.delete()
+        except Exception as e:
+            logger.warning(f"Xabarni o'chirishda xatolik: {e}")
+        return
+
+    if not command.args:
+        await message.reply("❗ Domenni kiriting: /blokd example.com")
+        return
+
+    domain, removed = await domain_blocklists.remove(message.chat.id, command.args.strip())
+    if not removed:
+        await message.reply(f"❗ {domain} - bu domen ro'yxatda yo'q.")
+        return
+    await message.reply(f"🗑️ {domain} taqiqlangan domenlardan olib tashlandi.")
+
+
+@group_router.message(Command("bloklar"), IsGroupMessage())
+async def handle_blocked_domains(message: Message) -> None:
+    """List group's blocked domains"""
+    if not await classify_admin(message):
+        try:
+            await message.delete()
+        except Exception as e:
+            logger.warning(f"Xabarni o'chirishda xatolik: {e}")
+        return
+
+    domains = domain_blocklists.domains(message.chat.id)
+    if not domains:
+        await message.answer("Taqiqlangan domenlar yo'q.")
+        return
+    await message.answer("Taqiqlangan domenlar:\n" + '\n'.join(domains))
+
+
 # === TOZALASH KOMANDALARI ===
 @group_router.message(Command("cleanuser"), IsGroupMessage())
 async def handle_clean_user(message: Message) -> None:
@@ -365,8 +421,12 @@ async def handle_clean_group(message: Message) -> None:
             logger.warning(f"Xabarni o'chirishda xatolik: {e}")
         return
 
-    await remove_all_members(message.chat.id)
-    await message.reply("🧨 Guruhdagi barcha foydalanuvchilarning qo'shganlari o'chirildi.")
+    group_id = message.chat.id
+    await group_maintenance.start(
+        message, "Qo'shilganlar o'chirilmoqda",
+        lambda progress: remove_all_members(group_id, progress),
+        "🧨 Guruhdagi barcha foydalanuvchilarning qo'shganlari o'chirildi."
+    )
 
 
 @group_router.message(Command("izohlard"), IsGroupMessage())
@@ -379,8 +439,12 @@ async def handle_clean_group(message: Message) -> None:
             logger.warning(f"Xabarni o'chirishda xatolik: {e}")
         return
 
-    await delete_group_comments(message.chat.id)
-    await message.reply("🧨 Guruhdagi barcha izoh ma'lumotlari tozalandi")
+    group_id = message.chat.id
+    await group_maintenance.start(
+        message, "Izoh ma'lumotlari tozalanmoqda",
+        lambda progress: delete_group_comments(group_id, progress),
+        "🧨 Guruhdagi barcha izoh ma'lumotlari tozalandi"
+    )
 
 
 # === STATISTIKA KOMANDALARI ===
@@ -465,24 +529,24 @@ async def handle_top(message: Message, bot: Bot) -> None:
                                  parse_mode="HTML")
             return
 
-    top_users = await get_top_adders(message.chat.id, limit=20)
+    text = await leaderboard_cache.get(TOP_ADDERS, message.chat.id, lambda: render_top_adders(bot, message.chat.id))
+    await message.reply(text, parse_mode="HTML")
+
+
+async def render_top_adders(bot: Bot, group_id: int) -> str:
+    top_users = await get_top_adders(group_id, limit=20)
 
     if not top_users:
-        await message.reply("📉 Hali hech kim foydalanuvchi qo'shmagan.")
-        return
+        return "📉 Hali hech kim foydalanuvchi qo'shmagan."
 
+    names = await profile_store.names(bot, group_id, (user_id for user_id, _ in top_users))
     text = "🏆 <b>Eng ko'p foydalanuvchi qo'shganlar:</b>\n\n"
     for i, (user_id, count) in enumerate(top_users, start=1):
-        try:
-            user = await bot.get_chat_member(message.chat.id, user_id)
-            full_name = user.user.full_name
-            mention = f'<a href="tg://user?id={user_id}">{full_name}</a>'
-            text += f"{i}. {mention} — {count} ta\n"
-        except Exception as e:
-            logger.warning(f"Foydalanuvchini olishda xatolik: {e}")
+        if user_id not in names:
             continue
-
-    await message.reply(text, parse_mode="HTML")
+        mention = f'<a href="tg://user?id={user_id}">{names[user_id]}</a>'
+        text += f"{i}. {mention} — {count} ta\n"
+    return text
 
 
 @group_router.message(Command("izohlar"), IsGroupMessage())
@@ -495,24 +559,25 @@ async def handle_comments(message: Message, bot: Bot) -> None:
             logger.warning(f"Xabarni o'chirishda xatolik: {e}")
         return
 
-    top_users = await get_top_commenters(message.chat.id, limit=20)
+    text = await leaderboard_cache.get(TOP_COMMENTERS, message.chat.id,
+                                       lambda: render_top_commenters(bot, message.chat.id))
+    await message.reply(text, parse_mode="HTML")
+
+
+async def render_top_commenters(bot: Bot, group_id: int) -> str:
+    top_users = await get_top_commenters(group_id, limit=20)
 
     if not top_users:
-        await message.reply("💬 Hali hech kim izoh yozmagan.")
-        return
+        return "💬 Hali hech kim izoh yozmagan."
 
+    names = await profile_store.names(bot, group_id, (user_id for user_id, _, _ in top_users))
     text = "💬 <b>Eng ko‘p izoh yozganlar:</b>\n\n"
     for i, (user_id, count, avg_len) in enumerate(top_users, start=1):
-        try:
-            member = await bot.get_chat_member(message.chat.id, user_id)
-            full_name = member.user.full_name
-            mention = f'<a href="tg://user?id={user_id}">{full_name}</a>'
-            text += f"{i}. {mention} — {count} ta izoh, o‘rtacha {avg_len} ta belgi\n"
-        except Exception as e:
-            print(f"[x] Foydalanuvchini olishda xatolik: {e}")
+        if user_id not in names:
             continue
-
-    await message.reply(text, parse_mode="HTML")
+        mention = f'<a href="tg://user?id={user_id}">{names[user_id]}</a>'
+        text += f"{i}. {mention} — {count} ta izoh, o‘rtacha {avg_len} ta belgi\n"
+    return text
 
 
 # kayp
@@ -524,13 +589,15 @@ async def is_comment_thread(message: Message, bot: Bot) -> bool:
     try:
         if reply.forward_from_chat and reply.is_automatic_forward:
             return True
-        cur.execute("""
+        if comment_buffer.has_comment(message.chat.id, reply.message_id):
+            return True
+        found = await fetchval("""
             SELECT 1 FROM all_comment
-            WHERE group_id = %s AND message_id = %s
+            WHERE group_id = $1 AND message_id = $2
             LIMIT 1
-        """, (message.chat.id, reply.message_id))
+        """, message.chat.id, reply.message_id)
 
-        if cur.fetchone():
+        if found:
             return True
 
     except Exception as e:
@@ -547,6 +614,12 @@ async def check_user_access(message: Message, bot: Bot) -> None:
     chat_id = message.chat.id
     user_id = user.id
 
+    # Guruhda talab ham, kanal ham bo'lmasa, hech qanday tekshiruv kerak emas
+    if group_policies.get(chat_id).is_empty:
+        if await is_comment_thread(message, bot):
+            await increment_user_comment(group_id=chat_id, user_id=user_id, message_text=message.text or "", message_id=message.message_id)
+        return
+
     # Adminlar tekshirilmaydi
     if await classify_admin(message):
         if await is_comment_thread(message,bot):
@@ -588,18 +661,25 @@ async def check_user_access(message: Message, bot: Bot) -> None:
         logger.warning(f"Ogohlantirish xabarini yuborishda xatolik: {e}")
         return
 
+    # 10 soniyadan so'ng ogohlantirishni o'chirish - scheduler orqali
+    run_at = datetime.now(timezone.utc) + timedelta(seconds=RESTRICT_SECONDS)
+    try:
+        await job_scheduler.schedule(DELETE_MESSAGE, run_at, chat_id, message_id=warn_msg.message_id)
+    except Exception as e:
+        logger.error(f"Rejalashtirishda xatolik: {e}")
+
+    # Backlog'dan kelgan eski xabar: 10 soniyalik cheklov muddati allaqachon o'tgan
+    # (o'tib ketgan until_date Telegram'da muddatsiz cheklov degani)
+    until = message.date + timedelta(seconds=RESTRICT_SECONDS)
+    if until <= datetime.now(timezone.utc):
+        return
+
     # 10 soniyaga yozishni cheklash
     chat_member = await bot.get_chat_member(chat_id, user_id)
-    can_send_messages = chat_member.can_send_messages
-    can_send_media_messages = chat_member.can_send_media_messages
-    can_send_polls = chat_member.can_send_polls
-    can_send_other_messages = chat_member.can_send_other_messages
-    can_add_web_page_previews = chat_member.can_add_web_page_previews
-    can_change_info = chat_member.can_change_info
-    can_invite_users = chat_member.can_invite_users
-    can_pin_messages = chat_member.can_pin_messages
+    # Oddiy a'zoda bu maydonlar yo'q - u holda hammasi ruxsat etilgan deb olinadi
+    saved_permissions = {name: getattr(chat_member, name, True) for name in RESTORED_PERMISSIONS}
     try:
-        until_timestamp = int((message.date + timedelta(seconds=10)).timestamp())
+        until_timestamp = int(until.timestamp())
         await bot.restrict_chat_member(
             chat_id,
             user_id,
@@ -619,30 +699,8 @@ async def check_user_access(message: Message, bot: Bot) -> None:
     except Exception as e:
         logger.warning(f"Foydalanuvchini cheklashda xatolik: {e}")
 
-    # 10 soniyadan so'ng cheklovni olib tashlash
-    await asyncio.sleep(10)
-
-    # Ogohlantirish xabarini o'chirish
-    try:
-        await bot.delete_message(chat_id, warn_msg.message_id)
-    except Exception as e:
-        logger.warning(f"Ogohlantirish xabarini o'chirishda xatolik: {e}")
-
-    # Foydalanuvchining yozish huquqini tiklash
+    # 10 soniyadan so'ng cheklovni olib tashlash - scheduler orqali
     try:
-        await bot.restrict_chat_member(
-            chat_id,
-            user_id,
-            permissions=ChatPermissions(
-                can_send_messages=can_send_messages,
-                can_send_media_messages=can_send_media_messages,
-                can_send_polls=can_send_polls,
-                can_send_other_messages=can_send_other_messages,
-                can_add_web_page_previews=can_add_web_page_previews,
-                can_change_info=can_change_info,
-                can_invite_users=can_invite_users,
-                can_pin_messages=can_pin_messages
-            )
-        )
+        await job_scheduler.schedule(RESTORE_PERMISSIONS, run_at, chat_id, user_id=user_id, payload=saved_permissions)
     except Exception as e:
-        logger.warning(f"Foydalanuvchi huquqlarini tiklashda xatolik: {e}")
+        logger.error(f"Rejalashtirishda xatolik: {e}")
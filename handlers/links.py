@@ -0,0 +1,210 @@
+import re
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from urllib.parse import urlsplit
+
+from aiogram.enums import MessageEntityType
+from aiogram.types import Message
+
+from config import BOT_USERNAME, LINK_ALLOWED_DOMAINS, LINK_ALLOWED_USERNAMES
+from database.pool import execute, fetch
+
+_MENTION_RE = re.compile(r'@(\w{5,})')
+
+
+def hostname(url: str) -> str:
+    """Lower-cased host of a URL or bare domain ("" if there is none)"""
+    try:
+        return (urlsplit(url if "://" in url else "http://" + url).hostname or "").rstrip(".")
+    except ValueError:
+        return ""
+
+
+class AhoCorasick:
+    """Multi-pattern substring matcher (one pass over the text)"""
+
+    def __init__(self, patterns: Iterable[str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[int, ...]] = [()]  # shu holatda tugaydigan pattern uzunliklari
+        for pattern in patterns:
+            self._insert(pattern)
+        self._build()
+
+    def _insert(self, pattern: str) -> None:
+        state = 0
+        for ch in pattern:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            state = nxt
+        self._out[state] += (len(pattern),)
+
+    def _build(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] += self._out[self._fail[nxt]]
+
+    def finditer(self, text: str) -> Iterator[Tuple[int, int]]:
+        """(start, end) of every pattern occurrence, in order of ``end``"""
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for end, ch in enumerate(text, 1):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for length in out[state]:
+                yield end - length, end
+
+    def search(self, text: str) -> bool:
+        return next(self.finditer(text), None) is not None
+
+
+def _label_char(ch: str) -> bool:
+    return ch.isalnum() or ch in "-_"
+
+
+class DomainMatcher(AhoCorasick):
+    """Finds blocked domains in text at hostname label boundaries.
+
+    ``x.com`` matches ``x.com`` and ``www.x.com`` but not ``box.com``,
+    ``x.company`` or ``x.com.evil.org``.
+    """
+
+    def __init__(self, domains: Iterable[str]):
+        domains = list(domains)
+        super().__init__(domains)
+        # Hamma domenda nuqta bo'lsa, nuqtasiz matnni skanerlash shart emas
+        self._dotted = all("." in d for d in domains)
+
+    def search(self, text: str) -> bool:
+        if self._dotted and "." not in text:
+            return False
+        goto, fail, out = self._goto, self._fail, self._out
+        last = len(text)
+        state = 0
+        for end, ch in enumerate(text, 1):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state] and self._accept(text, end, last, out[state]):
+                return True
+        return False
+
+    @staticmethod
+    def _accept(text: str, end: int, last: int, lengths: Tuple[int, ...]) -> bool:
+        if end < last:
+            ch = text[end]
+            if _label_char(ch) or (ch == "." and end + 1 < last and _label_char(text[end + 1])):
+                return False
+        return any(start == 0 or not _label_char(text[start - 1]) for start in (end - n for n in lengths))
+
+
+class LinkDetector:
+    """Finds links and foreign @mentions in a message.
+
+    Entities of text and caption are walked once without building new
+    lists; the own bot and allow-listed usernames/domains are skipped.
+    """
+
+    def __init__(self, bot_username: str, allowed_domains: Iterable[str] = (), allowed_usernames: Iterable[str] = ()):
+        self.allowed_usernames = {u.lower().lstrip("@") for u in allowed_usernames} | {bot_username.lower()}
+        self.allowed_domains = tuple(d.lower() for d in allowed_domains)
+
+    def _url_allowed(self, url: str) -> bool:
+        if not self.allowed_domains:
+            return False
+        host = hostname(url)
+        return any(host == d or host.endswith("." + d) for d in self.allowed_domains)
+
+    def has_link(self, message: Message, blocklist: Optional[DomainMatcher] = None) -> bool:
+        for text, entities in ((message.text, message.entities), (message.caption, message.caption_entities)):
+            if not text:
+                continue
+
+            # 1. Entitylar
+            for entity in entities or ():
+                entity_type = entity.type
+                if entity_type == MessageEntityType.MENTION:
+                    if entity.extract_from(text)[1:].lower() not in self.allowed_usernames:
+                        return True
+                elif entity_type == MessageEntityType.URL:
+                    if not self._url_allowed(entity.extract_from(text)):
+                        return True
+                elif entity_type == MessageEntityType.TEXT_LINK:
+                    if not self._url_allowed(entity.url):
+                        return True
+
+            # 2. Entity bo'lmagan @user matnlari
+            if "@" in text:
+                for match in _MENTION_RE.finditer(text):
+                    if match.group(1).lower() not in self.allowed_usernames:
+                        return True
+
+            # 3. Guruhning taqiqlangan domenlari
+            if blocklist is not None and blocklist.search(text.lower()):
+                return True
+        return False
+
+
+class DomainBlocklists:
+    """Per-group blocked domains, kept in memory with a compiled matcher per group"""
+
+    def __init__(self):
+        self._domains: Dict[int, Set[str]] = {}
+        self._matchers: Dict[int, DomainMatcher] = {}
+
+    async def load(self) -> None:
+        domains: Dict[int, Set[str]] = {}
+        for group_id, domain in await fetch("SELECT group_id, domain FROM blocked_domains"):
+            domains.setdefault(group_id, set()).add(domain)
+        self._domains = domains
+        self._matchers = {}
+
+    def domains(self, group_id: int) -> List[str]:
+        return sorted(self._domains.get(group_id, ()))
+
+    def matcher(self, group_id: int) -> Optional[DomainMatcher]:
+        matcher = self._matchers.get(group_id)
+        if matcher is None and self._domains.get(group_id):
+            matcher = self._matchers[group_id] = DomainMatcher(self._domains[group_id])
+        return matcher
+
+    async def add(self, group_id: int, domain: str) -> str:
+        """Block ``domain`` (a bare domain or a URL); returns the stored hostname"""
+        domain = hostname(domain.lower())
+        if not domain:
+            raise ValueError("empty domain")
+        await execute("""
+            INSERT INTO blocked_domains (group_id, domain) VALUES ($1, $2)
+            ON CONFLICT (group_id, domain) DO NOTHING
+        """, group_id, domain, idempotent=True)
+        self._domains.setdefault(group_id, set()).add(domain)
+        self._matchers.pop(group_id, None)
+        return domain
+
+    async def remove(self, group_id: int, domain: str) -> Tuple[str, bool]:
+        """Unblock ``domain``; returns the hostname and whether it was in the list"""
+        domain = hostname(domain.lower()) or domain.lower()
+        status = await execute("DELETE FROM blocked_domains WHERE group_id = $1 AND domain = $2", group_id, domain,
+                               idempotent=True)
+        blocked = self._domains.get(group_id, set())
+        removed = domain in blocked or status != "DELETE 0"
+        blocked.discard(domain)
+        self._matchers.pop(group_id, None)
+        return domain, removed
+
+
+link_detector = LinkDetector(BOT_USERNAME, LINK_ALLOWED_DOMAINS, LINK_ALLOWED_USERNAMES)
+domain_blocklists = DomainBlocklists()
@@ -0,0 +1,77 @@
+import asyncio
+import logging
+import time
+from contextlib import suppress
+from typing import Awaitable, Callable, Dict, Set
+
+from aiogram.types import Message
+
+from database.pool import Progress
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_INTERVAL = 3  # soniya
+
+MaintenanceJob = Callable[[Progress], Awaitable[int]]
+
+
+class GroupMaintenance:
+    """Long per-group jobs (/reset, /cleangroup, /izohlard) run in the background.
+
+    One job per group at a time; a status message is edited with the
+    number of processed rows while the job works through its chunks.
+    """
+
+    def __init__(self):
+        self._running: Dict[int, str] = {}  # {group_id: title}
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def start(self, message: Message, title: str, job: MaintenanceJob, done_text: str) -> bool:
+        group_id = message.chat.id
+        if group_id in self._running:
+            await message.answer(f"⏳ Avvalgi amal hali tugamadi: {self._running[group_id]}")
+            return False
+
+        self._running[group_id] = title
+        try:
+            status = await message.answer(f"⏳ {title}...")
+        except Exception:
+            del self._running[group_id]
+            raise
+        task = asyncio.create_task(self._run(group_id, status, title, job, done_text))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return True
+
+    async def _run(self, group_id: int, status: Message, title: str, job: MaintenanceJob, done_text: str) -> None:
+        processed = 0
+        last_report = time.monotonic()
+
+        async def progress(count: int) -> None:
+            nonlocal processed, last_report
+            processed += count
+            if time.monotonic() - last_report >= PROGRESS_INTERVAL:
+                last_report = time.monotonic()
+                with suppress(Exception):
+                    await status.edit_text(f"⏳ {title}: {processed} ta yozuv")
+
+        try:
+            await job(progress)
+            text = f"{done_text} ({processed} ta yozuv)"
+        except Exception as e:
+            logger.error(f"{title} ({group_id}) xatolik: {e}")
+            text = f"❌ {title}: xatolik yuz berdi, qayta urinib ko'ring"
+        finally:
+            self._running.pop(group_id, None)
+        with suppress(Exception):
+            await status.edit_text(text)
+
+    async def stop(self) -> None:
+        # Har bir chunk alohida yakunlangan, to'xtatilgan amalni qayta ishga tushirish mumkin
+        for task in list(self._tasks):
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+
+
+group_maintenance = GroupMaintenance()
@@ -1,46 +1,36 @@
 from aiogram.types import Message, Update
 from aiogram.dispatcher.middlewares.base import BaseMiddleware
 from aiogram import Bot
-from contextlib import suppress
-from config import cur, conn
+from database.census import group_census
+from database.profiles import profile_store
 
 
 class GroupUserMiddleware(BaseMiddleware):
     def __init__(self, bot: Bot):
         super().__init__()
         self.bot = bot
-        self.cur = cur  # Psikopg2 yoki sinxron kutubxona bilan ishlash
-        self.conn = conn  # Sinxron kutubxona bilan ishlash
+        self.census = group_census
+        self.profiles = profile_store
 
     async def __call__(self, handler, event: Update, data: dict):
+        # Yangilanishdagi foydalanuvchi nomini eslab qolamiz (/top, /izohlar uchun)
+        from_user = data.get("event_from_user")
+        if from_user is not None:
+            self.profiles.observe(from_user)
+        if event.chat_member is not None:
+            self.profiles.observe(event.chat_member.new_chat_member.user)
+
         message: Message = event.message  # Faqat message turlari uchun
         if message is None:
             return await handler(event, data)  # Message yo‘q bo‘lsa, middleware hech nima qilmasin
         chat = message.chat
 
         if chat.type in ["group", "supergroup"]:
-            # Guruh a’zolar sonini olishga harakat qilamiz
-            with suppress(Exception):
-                member_count = await self.bot.get_chat_member_count(chat.id)
-
-            # Botning guruhdagi adminligini tekshiramiz
-            bot_member = await self.bot.get_chat_member(chat.id, self.bot.id)
-            bot_status = True if bot_member.status in ['administrator', 'creator'] else False
-
-            # Sinxron kutubxona bilan ishlash
-            self.cur.execute("""
-                INSERT INTO groups (group_id, number, bot_status)
-                VALUES (%s, %s, %s)
-                ON CONFLICT (group_id) DO UPDATE SET
-                    number = EXCLUDED.number,
-                    bot_status = EXCLUDED.bot_status
-            """, (chat.id, member_count, bot_status))
+            # A'zolar soni va bot adminligi intervalda bir marta fonda yangilanadi
+            self.census.touch_group(self.bot, chat.id)
+            for new_member in message.new_chat_members or ():
+                self.profiles.observe(new_member)
         elif chat.type == "private":
-            self.cur.execute("""
-                INSERT INTO users (user_id)
-                VALUES (%s)
-                ON CONFLICT (user_id) DO NOTHING
-            """, (chat.id,))
-        self.conn.commit()  # Sinxron commit
+            self.census.touch_user(chat.id)
 
-        return await handler(event, data)
\ No newline at end of file
+        return await handler(event, data)
@@ -0,0 +1,183 @@
+import asyncio
+import heapq
+import time
+from collections import OrderedDict
+from contextlib import suppress
+from typing import Any, List, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import (
+    BanChatMember, CopyMessage, DeleteMessage, DeleteMessages, EditMessageText, ForwardMessage, RestrictChatMember,
+    SendMessage, TelegramMethod, UnbanChatMember
+)
+
+from config import OUTGOING_CHAT_BURST, OUTGOING_CHAT_RATE, OUTGOING_RATE
+
+
+class TokenBucket:
+    """Classic token bucket: ``rate`` tokens per second, at most ``capacity``"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds: float) -> None:
+        """Stop handing out tokens for ``seconds`` (Telegram RetryAfter)"""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+
+class ChatBuckets:
+    """Per-chat token buckets, the least recently used ones are dropped"""
+
+    def __init__(self, rate: float, capacity: float, maxsize: int = 10000):
+        self.rate = rate
+        self.capacity = capacity
+        self.maxsize = maxsize
+        self._buckets = OrderedDict()  # {chat_id: TokenBucket}
+
+    def get(self, chat_id: int) -> TokenBucket:
+        bucket = self._buckets.get(chat_id)
+        if bucket is None:
+            bucket = self._buckets[chat_id] = TokenBucket(self.rate, self.capacity)
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(chat_id)
+        return bucket
+
+    async def acquire(self, chat_id: int) -> None:
+        await self.get(chat_id).acquire()
+
+
+# Chiquvchi so'rovlar ustuvorligi: kichik raqam oldin yuboriladi
+DELETE, RESTRICT, WARNING, BULK = range(4)
+PRIORITY_NAMES = ("delete", "restrict", "warning", "bulk")
+METHOD_PRIORITIES = {
+    DeleteMessage: DELETE,
+    DeleteMessages: DELETE,
+    RestrictChatMember: RESTRICT,
+    BanChatMember: RESTRICT,
+    UnbanChatMember: RESTRICT,
+    SendMessage: WARNING,
+    CopyMessage: BULK,
+    ForwardMessage: BULK,
+    EditMessageText: BULK,
+}
+MAX_RETRIES = 3
+
+
+class OutgoingLimiter(BaseRequestMiddleware):
+    """Shared pacing for every outgoing Bot API write.
+
+    Calls wait for a per-chat token (messages only) and then queue for a
+    global token; the global queue is served strictly by priority, so
+    moderation deletes go before restrictions, warnings and broadcasts.
+    RetryAfter pauses the affected bucket and the call is queued again.
+    Read-only methods are not throttled.
+    """
+
+    def __init__(self, rate: float = OUTGOING_RATE, chat_rate: float = OUTGOING_CHAT_RATE,
+                 chat_burst: float = OUTGOING_CHAT_BURST):
+        self.rate = rate
+        self.bucket = TokenBucket(rate, rate)
+        self.chat_buckets = ChatBuckets(chat_rate, chat_burst)
+        self._queue: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = 0
+        self._ready = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.queued = [0] * len(PRIORITY_NAMES)
+        self.sent = [0] * len(PRIORITY_NAMES)
+        self.retry_after = 0
+
+    async def _grant(self, priority: int) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        self._seq += 1
+        heapq.heappush(self._queue, (priority, self._seq, future))
+        self.queued[priority] += 1
+        self._ready.set()
+        try:
+            await future
+        finally:
+            self.queued[priority] -= 1
+
+    async def _run(self) -> None:
+        while True:
+            await self._ready.wait()
+            await self.bucket.acquire()
+            while self._queue:
+                priority, _, future = heapq.heappop(self._queue)
+                if not future.done():
+                    future.set_result(None)
+                    self.sent[priority] += 1
+                    break
+            if not self._queue:
+                self._ready.clear()
+
+    async def __call__(self, make_request: NextRequestMiddlewareType, bot: Bot, method: TelegramMethod) -> Any:
+        priority = METHOD_PRIORITIES.get(type(method))
+        if priority is None:
+            return await make_request(bot, method)
+
+        chat_bucket = self.chat_buckets.get(method.chat_id) if priority >= WARNING else None
+        for attempt in range(MAX_RETRIES + 1):
+            if chat_bucket is not None:
+                await chat_bucket.acquire()
+            await self._grant(priority)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                self.retry_after += 1
+                if attempt == MAX_RETRIES:
+                    raise
+                # Xabar limiti odatda bitta chatga tegishli, qolganlari butun botga
+                (chat_bucket or self.bucket).pause(e.retry_after)
+
+    def share(self, workers: int) -> None:
+        """Take this process's part of ``rate`` when ``workers`` processes send for the same bot"""
+        rate = self.rate / max(workers, 1)
+        self.bucket.rate = rate
+        self.bucket.capacity = max(rate, 1)
+        self.bucket.tokens = min(self.bucket.tokens, self.bucket.capacity)
+
+    def stats(self) -> dict:
+        return {
+            "queued": dict(zip(PRIORITY_NAMES, self.queued)),
+            "sent": dict(zip(PRIORITY_NAMES, self.sent)),
+            "retry_after": self.retry_after,
+        }
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+
+outgoing_limiter = OutgoingLimiter()
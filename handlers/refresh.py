@@ -0,0 +1,102 @@
+import asyncio
+import logging
+import time
+from contextlib import suppress
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from aiogram import Bot
+
+from config import GROUP_REFRESH_CONCURRENCY, GROUP_REFRESH_INTERVAL
+from database.census import group_census
+from database.pool import execute, fetch
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 500
+PROGRESS_INTERVAL = 3  # soniya
+
+ProgressCallback = Callable[[int, int], Awaitable[None]]
+
+
+class GroupRefresher:
+    """Refresh member count and bot admin status of every known group.
+
+    Bot API calls run with bounded concurrency; results of each chunk are
+    written back with a single UPDATE ... FROM unnest(...) statement.
+    """
+
+    def __init__(self, concurrency: int = GROUP_REFRESH_CONCURRENCY, interval: float = GROUP_REFRESH_INTERVAL):
+        self.concurrency = concurrency
+        self.interval = interval
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    async def refresh_all(self, bot: Bot, progress: Optional[ProgressCallback] = None) -> int:
+        async with self._lock:
+            group_ids = [row[0] for row in await fetch("SELECT group_id FROM groups ORDER BY group_id")]
+            semaphore = asyncio.Semaphore(self.concurrency)
+            total, done, updated = len(group_ids), 0, 0
+            last_report = time.monotonic()
+
+            async def check(group_id: int) -> Optional[Tuple[int, int, bool]]:
+                async with semaphore:
+                    try:
+                        # A'zolar soni va adminligini tekshirish
+                        count = await bot.get_chat_member_count(group_id)
+                        me = await bot.get_chat_member(group_id, bot.id)
+                        return group_id, count, me.status in ("administrator", "creator")
+                    except Exception as e:
+                        print(f"Guruh {group_id} yangilashda xatolik: {e}")
+                        return None
+
+            for start in range(0, total, CHUNK_SIZE):
+                chunk = group_ids[start:start + CHUNK_SIZE]
+                results = [r for r in await asyncio.gather(*(check(g) for g in chunk)) if r is not None]
+                await self._write(results)
+                done += len(chunk)
+                updated += len(results)
+                if progress is not None and time.monotonic() - last_report >= PROGRESS_INTERVAL:
+                    last_report = time.monotonic()
+                    with suppress(Exception):
+                        await progress(done, total)
+            return updated
+
+    @staticmethod
+    async def _write(results: List[Tuple[int, int, bool]]) -> None:
+        if not results:
+            return
+        await execute("""
+            UPDATE groups
+            SET number = data.number, bot_status = data.bot_status
+            FROM unnest($1::bigint[], $2::int[], $3::boolean[]) AS data(group_id, number, bot_status)
+            WHERE groups.group_id = data.group_id
+        """, [r[0] for r in results], [r[1] for r in results], [r[2] for r in results], idempotent=True)
+        for group_id, count, is_admin in results:
+            group_census.update(group_id, count, is_admin, persist=False)
+
+    def start(self, bot: Bot) -> None:
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self._run(bot))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    async def _run(self, bot: Bot) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                updated = await self.refresh_all(bot)
+                logger.info(f"Rejalashtirilgan yangilash: {updated} ta guruh")
+            except Exception as e:
+                logger.error(f"Rejalashtirilgan yangilashda xatolik: {e}")
+
+
+group_refresher = GroupRefresher()
@@ -0,0 +1,138 @@
+import asyncio
+import heapq
+import json
+import logging
+from collections import defaultdict
+from contextlib import suppress
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.types import ChatPermissions
+
+from database.pool import fetch, fetchval, execute
+from handlers.deletion import deletion_queue
+from handlers.updates import shard_of
+
+logger = logging.getLogger(__name__)
+
+DELETE_MESSAGE = "delete_message"
+RESTORE_PERMISSIONS = "restore_permissions"
+
+
+class Job:
+    __slots__ = ("id", "run_at", "kind", "chat_id", "user_id", "message_id", "payload")
+
+    def __init__(self, id: int, run_at: datetime, kind: str, chat_id: int,
+                 user_id: Optional[int] = None, message_id: Optional[int] = None, payload: Optional[dict] = None):
+        self.id = id
+        self.run_at = run_at
+        self.kind = kind
+        self.chat_id = chat_id
+        self.user_id = user_id
+        self.message_id = message_id
+        self.payload = payload or {}
+
+
+class JobScheduler:
+    """Delayed jobs (delete warning, lift restriction) kept in a heap.
+
+    Every job is stored in scheduled_jobs first, so pending jobs survive a
+    restart. Jobs that are due at the same time are run together.
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[datetime, int, Job]] = []
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._bot: Optional[Bot] = None
+
+    async def schedule(self, kind: str, run_at: datetime, chat_id: int, user_id: Optional[int] = None,
+                       message_id: Optional[int] = None, payload: Optional[dict] = None) -> None:
+        job_id = await fetchval("""
+            INSERT INTO scheduled_jobs (run_at, kind, chat_id, user_id, message_id, payload)
+            VALUES ($1, $2, $3, $4, $5, $6::jsonb)
+            RETURNING id
+        """, run_at, kind, chat_id, user_id, message_id, json.dumps(payload or {}), idempotent=False)
+        self._push(Job(job_id, run_at, kind, chat_id, user_id, message_id, payload))
+
+    def _push(self, job: Job) -> None:
+        heapq.heappush(self._heap, (job.run_at, job.id, job))
+        if self._heap[0][2] is job:
+            self._wakeup.set()
+
+    async def load(self, shard_index: int = 0, shard_count: int = 1) -> None:
+        """Load jobs left over from the previous run (only this worker's chats)"""
+        rows = await fetch("""
+            SELECT id, run_at, kind, chat_id, user_id, message_id, payload
+            FROM scheduled_jobs
+        """)
+        for row in rows:
+            if shard_of(row[3], shard_count) != shard_index:
+                continue
+            self._push(Job(row[0], row[1], row[2], row[3], row[4], row[5], json.loads(row[6] or "{}")))
+
+    def start(self, bot: Bot) -> None:
+        self._bot = bot
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        # Bajarilmagan ishlar jadvalda qoladi va keyingi ishga tushishda yuklanadi
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            timeout = None
+            if self._heap:
+                timeout = (self._heap[0][0] - datetime.now(timezone.utc)).total_seconds()
+            if timeout is None or timeout > 0:
+                with suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+                continue
+
+            now = datetime.now(timezone.utc)
+            due = []
+            while self._heap and self._heap[0][0] <= now:
+                due.append(heapq.heappop(self._heap)[2])
+            try:
+                await self._run_batch(due)
+            except Exception as e:
+                logger.error(f"Scheduler batch error: {e}")
+
+    async def _run_batch(self, jobs: List[Job]) -> None:
+        deletes = defaultdict(list)
+        restores = []
+        for job in jobs:
+            if job.kind == DELETE_MESSAGE:
+                deletes[job.chat_id].append(job.message_id)
+            elif job.kind == RESTORE_PERMISSIONS:
+                restores.append(job)
+
+        await asyncio.gather(
+            *(self._delete_messages(chat_id, message_ids) for chat_id, message_ids in deletes.items()),
+            *(self._restore_permissions(job) for job in restores),
+        )
+        await execute("DELETE FROM scheduled_jobs WHERE id = ANY($1::bigint[])", [job.id for job in jobs],
+                      idempotent=True)
+
+    async def _delete_messages(self, chat_id: int, message_ids: List[int]) -> None:
+        await deletion_queue.delete(self._bot, chat_id, message_ids)
+
+    async def _restore_permissions(self, job: Job) -> None:
+        try:
+            await self._bot.restrict_chat_member(
+                job.chat_id,
+                job.user_id,
+                permissions=ChatPermissions(**job.payload)
+            )
+        except Exception as e:
+            logger.warning(f"Foydalanuvchi huquqlarini tiklashda xatolik: {e}")
+
+
+job_scheduler = JobScheduler()
@@ -0,0 +1,105 @@
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Set
+
+from aiogram.types import Update
+
+logger = logging.getLogger(__name__)
+
+UpdateHandler = Callable[[Any], Awaitable[Any]]
+
+
+def update_chat_id(update: Dict[str, Any]) -> int:
+    """Chat an update belongs to (the sender for chat-less updates, 0 if none)"""
+    for key, event in update.items():
+        if key == "update_id" or not isinstance(event, dict):
+            continue
+        chat = event.get("chat") or (event.get("message") or {}).get("chat")
+        if chat:
+            return chat["id"]
+        user = event.get("from") or event.get("user")
+        if user:
+            return user["id"]
+    return 0
+
+
+def event_chat_id(update: Update) -> int:
+    """update_chat_id for an already parsed Update"""
+    event = update.event
+    chat = getattr(event, "chat", None) or getattr(getattr(event, "message", None), "chat", None)
+    if chat is not None:
+        return chat.id
+    user = getattr(event, "from_user", None) or getattr(event, "user", None)
+    return user.id if user is not None else 0
+
+
+def shard_of(chat_id: int, shard_count: int) -> int:
+    return chat_id % shard_count
+
+
+class ChatSerializer:
+    """Processes updates of different chats concurrently, of one chat in order.
+
+    Every chat with pending updates gets one drain task; ``concurrency``
+    bounds how many updates are handled at the same time overall.
+    """
+
+    def __init__(self, handler: UpdateHandler, concurrency: int, max_pending: int = 0):
+        self._handler = handler
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self.max_pending = max_pending
+        self._queues: Dict[int, Deque[Any]] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self._progress = asyncio.Event()
+        self.pending = 0
+        self.processed = 0
+        self.failed = 0
+
+    def submit(self, chat_id: int, update: Any) -> bool:
+        """Queue an update; False when ``max_pending`` updates are already waiting"""
+        if self.max_pending and self.pending >= self.max_pending:
+            return False
+        self.pending += 1
+        queue = self._queues.get(chat_id)
+        if queue is not None:
+            queue.append(update)
+            return True
+        self._queues[chat_id] = deque((update,))
+        task = asyncio.create_task(self._drain(chat_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return True
+
+    async def _drain(self, chat_id: int) -> None:
+        queue = self._queues[chat_id]
+        try:
+            while queue:
+                update = queue.popleft()
+                async with self._semaphore:
+                    try:
+                        await self._handler(update)
+                        self.processed += 1
+                    except Exception as err:
+                        self.failed += 1
+                        logger.error(f"Update error (chat {chat_id}): {err}")
+                    finally:
+                        self.pending -= 1
+                        self._progress.set()
+        finally:
+            del self._queues[chat_id]
+
+    @property
+    def active_chats(self) -> int:
+        return len(self._queues)
+
+    async def wait_pending(self, limit: int) -> None:
+        """Wait until at most ``limit`` updates are queued"""
+        while self.pending > limit:
+            self._progress.clear()
+            await self._progress.wait()
+
+    async def join(self) -> None:
+        """Wait until every queued update has been handled"""
+        while self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
@@ -39,6 +39,8 @@ async def help_handler(message: Message):
         "🔹 <b>/kanallar</b> – Ulangan kanallar ro‘yxati\n"
         "🔹 <b>/kanal @username</b> – Yangi kanalni ulash\n"
         "🔹 <b>/kanald @username</b> – Kanalni ro‘yxatdan olib tashlash\n"
+        "🔹 <b>/blok domen</b> – Domenni taqiqlash\n"
+        "🔹 <b>/blokd domen</b> – Domenni taqiqdan chiqarish\n"
         "🔹 <b>/cleanuser</b> – Foydalanuvchining qo‘shganlarini tozalash\n"
         "🔹 <b>/cleangroup</b> – Guruhdagi barcha qo‘shilgan foydalanuvchilarni tozalash\n"
         "🔹 <b>/izohlar</b> – Guruhdagi top 20ta izohchilar ro'yxati\n"
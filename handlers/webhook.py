@@ -0,0 +1,179 @@
+import asyncio
+import logging
+import multiprocessing
+import queue
+import signal
+from contextlib import suppress
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from aiohttp import web
+
+from config import (
+    UPDATE_CONCURRENCY, UPDATE_QUEUE_SIZE, WEBHOOK_HOST, WEBHOOK_PATH, WEBHOOK_PORT, WEBHOOK_SECRET,
+    WEBHOOK_URL, WEBHOOK_WORKERS, bot, dp
+)
+from database.frombase import init_db
+from database.pool import close_pool
+from handlers.updates import ChatSerializer, shard_of, update_chat_id
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+MONITOR_INTERVAL = 5  # soniya
+STOP_TIMEOUT = 30  # soniya
+
+Setup = Callable[[], None]
+Startup = Callable[..., Awaitable[None]]
+Shutdown = Callable[[], Awaitable[None]]
+
+
+def _feed(update: Dict[str, Any]) -> Awaitable[Any]:
+    return dp.feed_raw_update(bot, update)
+
+
+def _worker_process(index: int, count: int, updates, setup: Setup, startup: Startup, shutdown: Shutdown) -> None:
+    # Ctrl+C butun guruhga keladi, to'xtatishni asosiy jarayon boshqaradi
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(_worker_main(index, count, updates, setup, startup, shutdown))
+
+
+async def _worker_main(index: int, count: int, updates, setup: Setup, startup: Startup, shutdown: Shutdown) -> None:
+    setup()
+    await startup(index, count, migrate=False)
+    serializer = ChatSerializer(_feed, UPDATE_CONCURRENCY)
+    loop = asyncio.get_running_loop()
+    logger.info(f"Worker {index}/{count} started")
+    try:
+        while True:
+            item = await loop.run_in_executor(None, updates.get)
+            if item is None:
+                break
+            serializer.submit(*item)
+        await serializer.join()
+    finally:
+        await shutdown()
+        await bot.session.close()
+
+
+class WorkerPool:
+    """Worker processes fed by the webhook listener.
+
+    Updates are routed by chat_id, so all updates of one chat land in the
+    same worker and are handled there in order.
+    """
+
+    def __init__(self, count: int, setup: Setup, startup: Startup, shutdown: Shutdown):
+        self._ctx = multiprocessing.get_context("spawn")
+        self._args = (setup, startup, shutdown)
+        self.count = count
+        self.queues = [self._ctx.Queue(UPDATE_QUEUE_SIZE) for _ in range(count)]
+        self.processes: List[Optional[multiprocessing.Process]] = [None] * count
+        self._stopping = False
+        self._monitor: Optional[asyncio.Task] = None
+
+    def _spawn(self, index: int) -> None:
+        process = self._ctx.Process(
+            target=_worker_process,
+            args=(index, self.count, self.queues[index], *self._args),
+            name=f"worker-{index}"
+        )
+        process.start()
+        self.processes[index] = process
+
+    def start(self) -> None:
+        for index in range(self.count):
+            self._spawn(index)
+        self._monitor = asyncio.create_task(self._watch())
+
+    def submit(self, chat_id: int, update: Dict[str, Any]) -> bool:
+        try:
+            self.queues[shard_of(chat_id, self.count)].put_nowait((chat_id, update))
+            return True
+        except queue.Full:
+            return False
+
+    def depths(self) -> List[int]:
+        with suppress(NotImplementedError):
+            return [q.qsize() for q in self.queues]
+        return []
+
+    async def _watch(self) -> None:
+        while not self._stopping:
+            await asyncio.sleep(MONITOR_INTERVAL)
+            for index, process in enumerate(self.processes):
+                if not self._stopping and process is not None and not process.is_alive():
+                    logger.error(f"Worker {index} exited with code {process.exitcode}, restarting")
+                    self._spawn(index)
+
+    async def stop(self) -> None:
+        self._stopping = True
+        if self._monitor is not None:
+            self._monitor.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._monitor
+        loop = asyncio.get_running_loop()
+        for q in self.queues:
+            with suppress(queue.Full):
+                await loop.run_in_executor(None, lambda: q.put(None, timeout=STOP_TIMEOUT))
+        for process in self.processes:
+            if process is None:
+                continue
+            await loop.run_in_executor(None, process.join, STOP_TIMEOUT)
+            if process.is_alive():
+                logger.error(f"{process.name} did not stop in time, terminating")
+                process.terminate()
+
+
+async def run_webhook(setup: Setup, startup: Startup, shutdown: Shutdown) -> None:
+    """Serve Telegram webhook updates with aiohttp until SIGINT/SIGTERM"""
+    setup()
+    pool: Optional[WorkerPool] = None
+    serializer: Optional[ChatSerializer] = None
+    if WEBHOOK_WORKERS > 1:
+        # Jadvallar bir marta yaratiladi, keyin workerlar faqat pool ochadi
+        await init_db()
+        await close_pool()
+        pool = WorkerPool(WEBHOOK_WORKERS, setup, startup, shutdown)
+        pool.start()
+        submit = pool.submit
+    else:
+        await startup()
+        serializer = ChatSerializer(_feed, UPDATE_CONCURRENCY, UPDATE_QUEUE_SIZE)
+        submit = serializer.submit
+
+    async def handle(request: web.Request) -> web.Response:
+        if WEBHOOK_SECRET and request.headers.get(SECRET_HEADER) != WEBHOOK_SECRET:
+            return web.Response(status=401)
+        update = await request.json()
+        if not submit(update_chat_id(update), update):
+            # Navbat to'la: Telegram update'ni keyinroq qayta yuboradi
+            return web.Response(status=503)
+        return web.Response()
+
+    app = web.Application()
+    app.router.add_post(WEBHOOK_PATH, handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, WEBHOOK_HOST, WEBHOOK_PORT).start()
+    await bot.set_webhook(
+        WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH,
+        secret_token=WEBHOOK_SECRET or None,
+        allowed_updates=dp.resolve_used_update_types()
+    )
+    logger.info(f"Webhook listening on {WEBHOOK_HOST}:{WEBHOOK_PORT}{WEBHOOK_PATH} ({WEBHOOK_WORKERS} worker)")
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        with suppress(NotImplementedError):
+            loop.add_signal_handler(sig, stop.set)
+    try:
+        await stop.wait()
+    finally:
+        await runner.cleanup()
+        if pool is not None:
+            await pool.stop()
+        else:
+            await serializer.join()
+            await shutdown()
+        await bot.session.close()
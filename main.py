@@ -1,24 +1,94 @@
 import asyncio
 import logging
 from aiogram import Bot, Dispatcher
-from config import BOT_TOKEN, dp, bot
+from config import BOT_MODE, BOT_TOKEN, CATCH_UP, dp, bot
+from database.census import group_census
+from database.channel_info import channel_info_cache
+from database.comment_buffer import comment_buffer
 from database.frombase import init_db
+from database.policy import group_policies
+from database.pool import close_pool, init_pool
+from database.profiles import profile_store
+from database.stats import stats_snapshot
 from handlers.admin import admin_router
+from handlers.broadcast import broadcast_engine
+from handlers.catchup import catch_up
+from handlers.coalescer import request_coalescer
+from handlers.deletion import deletion_queue
+from handlers.links import domain_blocklists
+from handlers.maintenance import group_maintenance
 from handlers.middleware import GroupUserMiddleware
+from handlers.ratelimit import outgoing_limiter
+from handlers.refresh import group_refresher
+from handlers.scheduler import job_scheduler
 from handlers.users import user_router
 from handlers.groups import group_router
+from handlers.webhook import run_webhook
 
 
-async def main():
-    await init_db()
+async def on_startup(shard_index: int = 0, shard_count: int = 1, migrate: bool = True):
+    # Telegram limiti butun bot uchun - har bir worker o'z ulushini oladi
+    outgoing_limiter.share(shard_count)
+    if migrate:
+        await init_db()
+    else:
+        await init_pool()
+    await group_policies.load()
+    await domain_blocklists.load()
+    comment_buffer.start()
+    group_census.start()
+    await channel_info_cache.warm()
+    channel_info_cache.start(bot, refresh=shard_index == 0)
+    await job_scheduler.load(shard_index, shard_count)
+    job_scheduler.start(bot)
+    await broadcast_engine.resume_all(bot, shard_index, shard_count)
+    if shard_index == 0:
+        group_refresher.start(bot)
+    stats_snapshot.start()
+    profile_store.start()
+
+
+async def on_shutdown():
+    await group_maintenance.stop()
+    await stats_snapshot.stop()
+    await group_refresher.stop()
+    await broadcast_engine.stop()
+    await job_scheduler.stop()
+    await comment_buffer.stop()
+    await group_census.stop()
+    await profile_store.stop()
+    await channel_info_cache.stop()
+    await deletion_queue.stop()
+    await outgoing_limiter.stop()
+    await close_pool()
+
+
+def setup_dispatcher():
     # logging.basicConfig(level=logging.INFO)
+    bot.session.middleware(request_coalescer)
+    bot.session.middleware(outgoing_limiter)
     dp.update.middleware(GroupUserMiddleware(bot))
 
     dp.include_router(group_router)
     dp.include_router(user_router)
     dp.include_router(admin_router)
 
-    await dp.start_polling(bot, skip_updates=True)
+
+async def main():
+    if BOT_MODE == "webhook":
+        await run_webhook(setup_dispatcher, on_startup, on_shutdown)
+        return
+
+    setup_dispatcher()
+    await on_startup()
+    try:
+        # Webhook o'rnatilgan bo'lsa getUpdates ishlamaydi
+        await bot.delete_webhook(drop_pending_updates=not CATCH_UP)
+        if CATCH_UP:
+            await catch_up(bot, dp)
+        await dp.start_polling(bot)
+    finally:
+        await on_shutdown()
 
 
 if __name__ == "__main__":